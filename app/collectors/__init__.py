@@ -2,9 +2,11 @@
 Collectors module - contains all IP collectors.
 """
 from .base import BaseCollector
+from .http_cache import FeedCache, FeedResult
 from .ipsum import IpsumCollector
 from .abuseipdb import AbuseIPDBCollector
 from .cncert import CNCERTCollector
+from .list import ListCollector
 
 
 # Registry of all available collectors
@@ -12,6 +14,7 @@ COLLECTOR_REGISTRY = {
     'ipsum': IpsumCollector,
     'abuseipdb': AbuseIPDBCollector,
     'cncert': CNCERTCollector,
+    'list': ListCollector,
 }
 
 
@@ -37,9 +40,12 @@ def get_collector(name: str, config: dict) -> BaseCollector:
 
 __all__ = [
     'BaseCollector',
+    'FeedCache',
+    'FeedResult',
     'IpsumCollector',
     'AbuseIPDBCollector',
     'CNCERTCollector',
+    'ListCollector',
     'COLLECTOR_REGISTRY',
     'get_collector',
 ]
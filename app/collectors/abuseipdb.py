@@ -1,83 +1,253 @@
 """
 AbuseIPDB collector - fetches IPs from AbuseIPDB API.
 """
+import json
+import os
+import time
 import requests
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+from urllib.parse import urlencode
 from .base import BaseCollector
+from .http_cache import FeedResult
+from ..utils.batch import IPBatch
 
 
 class AbuseIPDBCollector(BaseCollector):
     """
     Collector for AbuseIPDB threat intelligence feed.
     https://www.abuseipdb.com/
+
+    The blacklist endpoint has a strict daily quota. The remaining quota is
+    read from the X-RateLimit-* response headers and persisted next to the
+    feed cache; once it is used up, the last good response is served from
+    the cache until the quota resets.
     """
 
     API_URL = "https://api.abuseipdb.com/api/v2/blacklist"
 
+    # Response formats: plaintext is one IP per line, json carries scores
+    MODES = ('plaintext', 'json')
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Initialize the collector.
+        
+        Args:
+            config: Configuration dictionary for this collector
+        """
+        super().__init__(config)
+        self.quota_path = os.path.join(self.feed_cache.cache_dir, 'quota.json')
+
     @property
     def name(self) -> str:
         return "abuseipdb"
 
-    def fetch(self) -> List[Dict[str, Any]]:
+    def fetch(self) -> IPBatch:
         """
         Fetch IPs from AbuseIPDB blacklist API.
         
         Returns:
-            List of IP dictionaries
+            Batch of IPs
+        """
+        result = IPBatch(self.name)
+        for batch in self.fetch_batches():
+            result.extend(batch)
+        return result
+
+    def fetch_batches(self) -> Iterator[IPBatch]:
+        """
+        Stream IPs from the AbuseIPDB blacklist in batches of BATCH_SIZE.
+        
+        Yields:
+            Batches of IPs
         """
         self.log_info("Starting to fetch IPs from AbuseIPDB...")
         
         api_key = self.config.get('api_key')
         if not api_key:
             self.log_error("API key not configured")
-            return []
+            return
         
         confidence_minimum = self.config.get('confidence_minimum', 90)
         limit = self.config.get('limit', 10000)
+        mode = self.config.get('mode', 'plaintext')
+        if mode not in self.MODES:
+            self.log_error(f"Unknown mode '{mode}', expected one of {', '.join(self.MODES)}")
+            return
+        
+        headers = {
+            'Key': api_key,
+            'Accept': 'text/plain' if mode == 'plaintext' else 'application/json'
+        }
+        
+        params = {
+            'confidenceMinimum': confidence_minimum,
+            'limit': limit
+        }
+        if mode == 'plaintext':
+            params['plaintext'] = 'true'
         
-        ips = []
+        # Query string is part of the cache key, so each mode and limit
+        # keeps its own last good result
+        url = f"{self.API_URL}?{urlencode(params)}"
+        
+        count = 0
         
         try:
-            headers = {
-                'Key': api_key,
-                'Accept': 'application/json'
-            }
-            
-            params = {
-                'confidenceMinimum': confidence_minimum,
-                'limit': limit
-            }
-            
-            response = requests.get(
-                self.API_URL,
-                headers=headers,
-                params=params,
-                timeout=60
-            )
-            response.raise_for_status()
-            
-            data = response.json()
+            feed = self._fetch_within_quota(url, headers)
+            if feed is None:
+                return
             
-            if 'data' in data:
-                for entry in data['data']:
-                    ip_address = entry.get('ipAddress')
-                    score = entry.get('abuseConfidenceScore', 0)
-                    
-                    if ip_address:
-                        ips.append({
-                            'ip': ip_address,
-                            'source': self.name,
-                            'score': score,
-                            'last_seen': datetime.now()
-                        })
+            if mode == 'plaintext':
+                # Every listed IP is at or above the requested confidence
+                records = ((line, confidence_minimum) for line in feed.iter_lines() if line.strip())
+            else:
+                records = self._parse_json(feed)
             
-            self.log_info(f"Successfully fetched {len(ips)} IPs (confidence>={confidence_minimum})")
-            return ips
+            for batch in self.make_batches(records):
+                count += len(batch)
+                yield batch
             
+            self.log_info(f"Successfully fetched {count} IPs (confidence>={confidence_minimum})")
+        
         except requests.RequestException as e:
             self.log_error(f"Failed to fetch IPs: {e}")
-            return []
         except Exception as e:
             self.log_error(f"Unexpected error: {e}")
-            return []
+
+    def _fetch_within_quota(self, url: str, headers: Dict[str, str]) -> Optional[FeedResult]:
+        """
+        Download the blacklist unless the daily quota is exhausted.
+        
+        Args:
+            url: Blacklist URL including the query string
+            headers: Request headers
+        
+        Returns:
+            Fresh or cached FeedResult, or None if nothing is available
+        
+        Raises:
+            requests.RequestException: If the request fails for a reason
+                other than the rate limit
+        """
+        quota = self._load_quota()
+        reserve = self.config.get('quota_reserve', 0)
+        remaining = quota.get('remaining')
+        reset_at = quota.get('reset_at') or 0
+        
+        if remaining is not None and remaining <= reserve and time.time() < reset_at:
+            self.log_info(f"Quota exhausted ({remaining} left) until "
+                          f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(reset_at))}, "
+                          f"serving last cached result")
+            return self._get_cached(url)
+        
+        try:
+            feed = self.fetch_feed(url, timeout=60, headers=headers)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 429:
+                raise
+            self._save_quota(e.response.headers, exhausted=True)
+            self.log_error("Rate limit exceeded, serving last cached result")
+            return self._get_cached(url)
+        
+        self._save_quota(feed.headers)
+        return feed
+
+    def _get_cached(self, url: str) -> Optional[FeedResult]:
+        """
+        Get the last good blacklist response from the feed cache.
+        
+        Args:
+            url: Blacklist URL including the query string
+        
+        Returns:
+            Cached FeedResult, or None if nothing was ever fetched
+        """
+        feed = self.feed_cache.get_cached(url)
+        if feed is None:
+            self.log_info("No cached result available")
+        return feed
+
+    def _load_quota(self) -> Dict[str, Any]:
+        """
+        Load the persisted quota state.
+        
+        Returns:
+            Dictionary with 'remaining' and 'reset_at', empty if unknown
+        """
+        try:
+            with open(self.quota_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_quota(self, headers: Mapping[str, str], exhausted: bool = False):
+        """
+        Persist the quota state reported by the API.
+        
+        Args:
+            headers: Response headers
+            exhausted: The request was rejected with 429 Too Many Requests
+        """
+        remaining, reset_at = self._parse_quota(headers)
+        if exhausted:
+            remaining = 0
+            retry_after = headers.get('Retry-After')
+            if reset_at is None and retry_after and retry_after.isdigit():
+                reset_at = int(time.time()) + int(retry_after)
+        
+        if remaining is None:
+            return
+        
+        if reset_at is None:
+            # Daily quota: assume it resets within a day
+            reset_at = int(time.time()) + 86400
+        
+        self.log_debug(f"Quota remaining: {remaining}")
+        
+        try:
+            os.makedirs(os.path.dirname(self.quota_path), exist_ok=True)
+            tmp_path = f"{self.quota_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'remaining': remaining, 'reset_at': reset_at}, f)
+            os.replace(tmp_path, self.quota_path)
+        except OSError as e:
+            self.log_error(f"Failed to save quota state: {e}")
+
+    @staticmethod
+    def _parse_quota(headers: Mapping[str, str]) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Read the rate limit headers.
+        
+        Args:
+            headers: Response headers
+        
+        Returns:
+            Tuple of (remaining requests, reset epoch seconds), None if absent
+        """
+        def to_int(value: Optional[str]) -> Optional[int]:
+            try:
+                return int(value) if value is not None else None
+            except ValueError:
+                return None
+        
+        return to_int(headers.get('X-RateLimit-Remaining')), to_int(headers.get('X-RateLimit-Reset'))
+
+    @staticmethod
+    def _parse_json(feed: FeedResult) -> Iterator[Tuple[str, int]]:
+        """
+        Parse a JSON blacklist response into (ip, score) pairs.
+        
+        Args:
+            feed: Cached response
+        
+        Yields:
+            IP address strings with their confidence scores
+        """
+        with open(feed.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        for entry in data.get('data', []):
+            ip_address = entry.get('ipAddress')
+            if ip_address:
+                yield ip_address, entry.get('abuseConfidenceScore', 0)
@@ -1,11 +1,16 @@
 """
 Base collector class for all IP collectors.
 """
+import json
+import os
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import Callable, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
 from datetime import datetime
 import logging
 
+from .http_cache import FeedCache, FeedResult
+from ..utils.batch import IPBatch, IPRecords, to_epoch
+
 
 class BaseCollector(ABC):
     """
@@ -13,6 +18,15 @@ class BaseCollector(ABC):
     Each collector must implement the fetch() method.
     """
 
+    # Seconds a single fetch() may take before the engine abandons it
+    DEFAULT_TIMEOUT = 600
+
+    # Records per batch handed to the database by streaming collectors
+    BATCH_SIZE = 10000
+
+    # Upper bound in seconds for the retry delay after repeated failures
+    DEFAULT_MAX_BACKOFF = 86400
+
     def __init__(self, config: Dict[str, Any]):
         """
         Initialize the collector with configuration.
@@ -22,7 +36,29 @@ class BaseCollector(ABC):
         """
         self.config = config
         self.enabled = config.get('enabled', False)
+        self.timeout = config.get('timeout', self.DEFAULT_TIMEOUT)
+        
+        # Scheduling: own interval (None = global update_interval), random
+        # delay added to each run, and cap for the exponential backoff
+        self.interval = config.get('interval')
+        self.jitter = config.get('jitter', 0)
+        self.max_backoff = config.get('max_backoff', self.DEFAULT_MAX_BACKOFF)
+        
+        # Errors logged during the current run, see log_error
+        self.errors = 0
+        
+        # Set by the engine: refreshes the stored entries of an unchanged
+        # feed, see IPDatabase.refresh_source
+        self.refresh_source: Optional[Callable[[str, str], bool]] = None
+        
+        # Fingerprints of the feeds fully parsed in the current run; the
+        # engine records them once their entries are stored
+        self.parsed_feeds: Dict[str, str] = {}
         self.logger = logging.getLogger(f"collector.{self.name}")
+        
+        # Per-collector on-disk cache of downloaded feeds
+        cache_dir = config.get('cache_dir', 'data/cache')
+        self.feed_cache = FeedCache(os.path.join(cache_dir, self.name))
 
     @property
     @abstractmethod
@@ -31,12 +67,13 @@ class BaseCollector(ABC):
         pass
 
     @abstractmethod
-    def fetch(self) -> List[Dict[str, Any]]:
+    def fetch(self) -> IPRecords:
         """
         Fetch malicious IPs from the data source.
         
         Returns:
-            List of dictionaries containing IP information:
+            An IPBatch (preferred, see utils.batch) or, for compatibility,
+            a list of dictionaries containing IP information:
             [
                 {
                     'ip': '1.2.3.4',
@@ -49,6 +86,121 @@ class BaseCollector(ABC):
         """
         pass
 
+    def fetch_batches(self) -> Iterator[IPRecords]:
+        """
+        Fetch malicious IPs as a stream of fixed-size batches.
+        
+        The engine stores each batch as soon as it is yielded. The default
+        implementation yields the whole fetch() result as one batch;
+        collectors parsing large feeds override it to keep memory flat.
+        
+        Yields:
+            IPBatch objects or lists of IP dictionaries
+        """
+        ips = self.fetch()
+        if ips:
+            yield ips
+
+    def make_batches(self, records: Iterable[Tuple[str, int]],
+                     last_seen: Optional[Union[datetime, int]] = None) -> Iterator[IPBatch]:
+        """
+        Pack (ip, score) pairs into IPBatch objects of BATCH_SIZE entries.
+        
+        Args:
+            records: IP address strings with their scores
+            last_seen: Timestamp shared by every entry (default: now)
+            
+        Yields:
+            Batches tagged with this collector's name
+        """
+        last_seen = to_epoch(last_seen)
+        batch = IPBatch(self.name, last_seen)
+        
+        for ip, score in records:
+            batch.add(ip, score)
+            if len(batch) >= self.BATCH_SIZE:
+                yield batch
+                batch = IPBatch(self.name, last_seen)
+        
+        if len(batch) or batch.invalid:
+            yield batch
+
+    def make_batch(self, records: Iterable[Tuple[str, int]],
+                   last_seen: Optional[Union[datetime, int]] = None) -> IPBatch:
+        """
+        Pack (ip, score) pairs into a single IPBatch.
+        
+        Args:
+            records: IP address strings with their scores
+            last_seen: Timestamp shared by every entry (default: now)
+            
+        Returns:
+            Batch tagged with this collector's name
+        """
+        batch = IPBatch(self.name, last_seen)
+        for ip, score in records:
+            batch.add(ip, score)
+        return batch
+
+    def fetch_feed(self, url: str, timeout: float = 30, **kwargs) -> FeedResult:
+        """
+        Download a feed through the on-disk cache with conditional requests.
+        
+        Args:
+            url: Feed URL
+            timeout: Request timeout in seconds
+            **kwargs: Extra arguments for requests (headers, params, ...)
+            
+        Returns:
+            FeedResult; result.changed is False when the feed is unchanged
+            (see is_stored before skipping it)
+            
+        Raises:
+            requests.RequestException: If the request fails
+        """
+        return self.feed_cache.fetch(url, timeout=timeout, **kwargs)
+
+    @staticmethod
+    def feed_fingerprint(feed: FeedResult, settings: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Identify a feed body together with the settings it is parsed with.
+        
+        Args:
+            feed: Cached feed
+            settings: Parse settings that change the stored entries
+            
+        Returns:
+            Fingerprint string
+        """
+        return f"{feed.sha256}:{json.dumps(settings, sort_keys=True, default=str)}"
+
+    def is_stored(self, source: str, fingerprint: str) -> bool:
+        """
+        Check whether a feed can be skipped because it is already stored.
+        
+        An unchanged feed is only skipped while its entries are still in
+        the database; their last_seen is refreshed so retention does not
+        expire IPs that are still listed.
+        
+        Args:
+            source: Source name the entries are stored under
+            fingerprint: See feed_fingerprint
+            
+        Returns:
+            True if parsing and ingestion can be skipped
+        """
+        return self.refresh_source is not None and self.refresh_source(source, fingerprint)
+
+    def mark_parsed(self, source: str, fingerprint: str):
+        """
+        Record that a feed was parsed completely in this run.
+        
+        Args:
+            source: Source name the entries are stored under
+            fingerprint: See feed_fingerprint
+        """
+        self.parsed_feeds[source] = fingerprint
+
     def is_enabled(self) -> bool:
         """Check if this collector is enabled."""
         return self.enabled
@@ -57,8 +209,13 @@ class BaseCollector(ABC):
         """Log info message."""
         self.logger.info(f"[{self.name}] {message}")
 
+    def log_warning(self, message: str):
+        """Log warning message."""
+        self.logger.warning(f"[{self.name}] {message}")
+
     def log_error(self, message: str):
-        """Log error message."""
+        """Log error message and count it against the current run."""
+        self.errors += 1
         self.logger.error(f"[{self.name}] {message}")
 
     def log_debug(self, message: str):
@@ -1,12 +1,17 @@
 """
 CNCERT collector - fetches IPs from China National Computer Network Emergency Response Team.
 """
+import json
+import os
 import re
 import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
 from .base import BaseCollector
+from ..utils.batch import IPRecords
+from ..utils.bogons import is_public_ip
 
 
 class CNCERTCollector(BaseCollector):
@@ -19,77 +24,86 @@ class CNCERTCollector(BaseCollector):
     BASE_URL = "https://www.cert.org.cn"
     THREAT_URL = f"{BASE_URL}/publish/main/9/index.html"
 
+    # Default score for CNCERT
+    SCORE = 5
+
+    IP_PATTERN = re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b')
+
+    # Candidate IPv6 tokens; anything that is not a valid address (times
+    # like 12:30:45, MAC-like strings) is rejected by _is_valid_ip
+    IPV6_PATTERN = re.compile(r'(?<![0-9A-Fa-f:])(?:[0-9A-Fa-f]{0,4}:){2,7}[0-9A-Fa-f]{0,4}(?![0-9A-Fa-f:])')
+
     @property
     def name(self) -> str:
         return "cncert"
 
-    def fetch(self) -> List[Dict[str, Any]]:
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.workers = max(1, config.get('workers', 4))
+        
+        # One pooled session shared by all crawler threads
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session = self.feed_cache.session
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        self.article_cache_path = os.path.join(self.feed_cache.cache_dir, 'articles.json')
+
+    def fetch(self) -> IPRecords:
         """
         Fetch IPs from CNCERT announcements.
         
+        Articles are crawled in parallel and the IPs extracted from each are
+        cached by URL, so only articles not seen in earlier cycles are
+        downloaded.
+        
         Returns:
-            List of IP dictionaries
+            Batch of unique IPs
         """
         self.log_info("Starting to fetch IPs from CNCERT...")
         
-        ips = []
-        ip_pattern = re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b')
-        
         try:
             # Fetch the threat announcement page
-            response = requests.get(self.THREAT_URL, timeout=30)
-            response.encoding = 'utf-8'
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find all links to threat announcements
-            links = soup.find_all('a', href=True)
+            index = self.fetch_feed(self.THREAT_URL, timeout=30)
             
             # Limit to recent announcements
             max_articles = self.config.get('max_articles', 5)
-            article_count = 0
-            
-            for link in links:
-                if article_count >= max_articles:
-                    break
-                
-                href = link.get('href', '')
-                
-                # Look for announcement articles
-                if 'ARTI' in href or 'article' in href.lower():
-                    article_url = href if href.startswith('http') else f"{self.BASE_URL}{href}"
-                    
-                    try:
-                        article_response = requests.get(article_url, timeout=20)
-                        article_response.encoding = 'utf-8'
-                        
-                        # Extract IPs from article text
-                        found_ips = ip_pattern.findall(article_response.text)
-                        
-                        for ip in found_ips:
-                            # Basic validation
-                            if self._is_valid_ip(ip):
-                                ips.append({
-                                    'ip': ip,
-                                    'source': self.name,
-                                    'score': 5,  # Default score for CNCERT
-                                    'last_seen': datetime.now()
-                                })
-                        
-                        article_count += 1
-                        
-                    except Exception as e:
-                        self.log_debug(f"Failed to fetch article {article_url}: {e}")
-                        continue
-            
-            # Remove duplicates
-            unique_ips = {}
-            for ip_data in ips:
-                ip = ip_data['ip']
-                if ip not in unique_ips:
-                    unique_ips[ip] = ip_data
-            
-            result = list(unique_ips.values())
+            article_urls = self._find_articles(index.read_text(), max_articles)
+            
+            article_cache = self._load_article_cache()
+            new_urls = [url for url in article_urls if url not in article_cache]
+            
+            # No new announcements and every article was crawled and ingested;
+            # articles that failed to download are retried even then
+            fingerprint = self.feed_fingerprint(index, {'max_articles': max_articles})
+            if not new_urls and self.is_stored(self.name, fingerprint):
+                self.log_info("Announcement index not modified since last stored, skipping")
+                return []
+            
+            failed = 0
+            if new_urls:
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(new_urls))) as executor:
+                    for url, found in zip(new_urls, executor.map(self._crawl_article, new_urls)):
+                        if found is not None:
+                            article_cache[url] = found
+                        else:
+                            failed += 1
+            
+            self.log_debug(f"{len(article_urls)} recent articles, {len(new_urls)} new")
+            if failed:
+                self.log_info(f"Failed to download {failed} articles, retrying next cycle")
+            
+            # Only keep entries for articles still listed on the index
+            article_cache = {url: article_cache[url] for url in article_urls if url in article_cache}
+            self._save_article_cache(article_cache)
+            
+            ips = set()
+            for found in article_cache.values():
+                ips.update(found)
+            
+            # Duplicates were already removed by the set
+            result = self.make_batch((ip, self.SCORE) for ip in ips)
+            self.mark_parsed(self.name, fingerprint)
             self.log_info(f"Successfully fetched {len(result)} unique IPs from CNCERT")
             return result
             
@@ -100,9 +114,91 @@ class CNCERTCollector(BaseCollector):
             self.log_error(f"Unexpected error: {e}")
             return []
 
+    def _find_articles(self, html: str, max_articles: int) -> List[str]:
+        """
+        Extract announcement article URLs from the index page.
+        
+        Args:
+            html: Index page HTML
+            max_articles: Maximum number of URLs to return
+            
+        Returns:
+            Absolute article URLs in page order, without duplicates
+        """
+        soup = BeautifulSoup(html, 'lxml', parse_only=SoupStrainer('a', href=True))
+        
+        urls = []
+        for link in soup.find_all('a', href=True):
+            href = link.get('href', '')
+            
+            # Look for announcement articles
+            if 'ARTI' in href or 'article' in href.lower():
+                article_url = href if href.startswith('http') else f"{self.BASE_URL}{href}"
+                if article_url not in urls:
+                    urls.append(article_url)
+                    if len(urls) >= max_articles:
+                        break
+        
+        return urls
+
+    def _crawl_article(self, article_url: str) -> Optional[List[str]]:
+        """
+        Download one article and extract the IPs it lists.
+        
+        Args:
+            article_url: Article URL
+            
+        Returns:
+            Sorted list of valid IPs, or None if the download failed
+        """
+        try:
+            response = self.session.get(article_url, timeout=20)
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            
+            # Extract IPs from article text
+            found_ips = self.IP_PATTERN.findall(response.text)
+            found_ips += self.IPV6_PATTERN.findall(response.text)
+            
+            # Basic validation
+            return sorted({ip for ip in found_ips if self._is_valid_ip(ip)})
+            
+        except Exception as e:
+            self.log_debug(f"Failed to fetch article {article_url}: {e}")
+            return None
+
+    def _load_article_cache(self) -> Dict[str, List[str]]:
+        """
+        Load the IPs extracted from previously crawled articles.
+        
+        Returns:
+            Dictionary mapping article URL to its IP list
+        """
+        try:
+            with open(self.article_cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_article_cache(self, article_cache: Dict[str, List[str]]):
+        """
+        Persist the article IP cache.
+        
+        Args:
+            article_cache: Dictionary mapping article URL to its IP list
+        """
+        try:
+            os.makedirs(os.path.dirname(self.article_cache_path), exist_ok=True)
+            tmp_path = f"{self.article_cache_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(article_cache, f)
+            os.replace(tmp_path, self.article_cache_path)
+        except OSError as e:
+            self.log_error(f"Failed to save article cache: {e}")
+
     def _is_valid_ip(self, ip: str) -> bool:
         """
-        Validate if the IP address is valid and not private.
+        Validate if the IP address is valid and publicly routable.
         
         Args:
             ip: IP address string
@@ -110,37 +206,4 @@ class CNCERTCollector(BaseCollector):
         Returns:
             True if valid public IP
         """
-        try:
-            parts = ip.split('.')
-            if len(parts) != 4:
-                return False
-            
-            # Check each octet
-            for part in parts:
-                num = int(part)
-                if num < 0 or num > 255:
-                    return False
-            
-            # Exclude private and reserved IPs
-            first_octet = int(parts[0])
-            
-            # Private ranges: 10.x.x.x, 172.16-31.x.x, 192.168.x.x
-            if first_octet == 10:
-                return False
-            if first_octet == 172 and 16 <= int(parts[1]) <= 31:
-                return False
-            if first_octet == 192 and int(parts[1]) == 168:
-                return False
-            
-            # Loopback: 127.x.x.x
-            if first_octet == 127:
-                return False
-            
-            # Reserved: 0.x.x.x, 255.x.x.x
-            if first_octet == 0 or first_octet == 255:
-                return False
-            
-            return True
-            
-        except (ValueError, IndexError):
-            return False
+        return is_public_ip(ip)
@@ -0,0 +1,214 @@
+"""
+On-disk feed cache with conditional HTTP requests.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Any, Iterator, Mapping, Optional
+import logging
+
+import requests
+
+
+class FeedResult:
+    """
+    Outcome of a cached feed fetch.
+
+    Attributes:
+        url: Requested URL
+        changed: False if the server answered 304 Not Modified or the body
+            hashed identical to the cached copy
+        path: Path of the cached body on disk
+        status: HTTP status code of the response
+        headers: Response headers (empty when served from the cache alone)
+        sha256: SHA-256 hex digest of the cached body
+    """
+
+    def __init__(self, url: str, changed: bool, path: str, status: int,
+                 headers: Optional[Mapping[str, str]] = None, sha256: Optional[str] = None):
+        self.url = url
+        self.changed = changed
+        self.path = path
+        self.status = status
+        self.headers = headers if headers is not None else {}
+        self.sha256 = sha256
+
+    def read_text(self, encoding: str = 'utf-8') -> str:
+        """
+        Read the cached body as text.
+
+        Args:
+            encoding: Text encoding of the body
+
+        Returns:
+            Body text
+        """
+        with open(self.path, 'r', encoding=encoding, errors='replace') as f:
+            return f.read()
+
+    def iter_lines(self, encoding: str = 'utf-8') -> Iterator[str]:
+        """
+        Stream the cached body line by line without loading it into memory.
+
+        Args:
+            encoding: Text encoding of the body
+
+        Yields:
+            Lines without trailing newline characters
+        """
+        with open(self.path, 'r', encoding=encoding, errors='replace') as f:
+            for line in f:
+                yield line.rstrip('\r\n')
+
+
+class FeedCache:
+    """
+    Stores feed bodies and their validators (ETag, Last-Modified, SHA-256)
+    on disk and sends conditional requests, so unchanged feeds can be
+    skipped without parsing or ingesting them again.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, cache_dir: str, session: Optional[requests.Session] = None):
+        """
+        Initialize the feed cache.
+
+        Args:
+            cache_dir: Directory for cached bodies and metadata
+            session: HTTP session to use (a new one if omitted)
+        """
+        self.cache_dir = cache_dir
+        self.session = session or requests.Session()
+        self.logger = logging.getLogger("feed_cache")
+
+    def _paths(self, url: str):
+        """
+        Get the body and metadata paths for a URL.
+
+        Args:
+            url: Feed URL
+
+        Returns:
+            Tuple of (body path, metadata path)
+        """
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.body", f"{base}.json"
+
+    def _load_meta(self, meta_path: str) -> Dict[str, Any]:
+        """
+        Load cached metadata.
+
+        Args:
+            meta_path: Metadata file path
+
+        Returns:
+            Metadata dictionary, empty if missing or unreadable
+        """
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get_cached(self, url: str) -> Optional[FeedResult]:
+        """
+        Get the last cached body of a URL without a network request.
+
+        Args:
+            url: Feed URL
+
+        Returns:
+            FeedResult with changed=False, or None if nothing is cached
+        """
+        body_path, meta_path = self._paths(url)
+        if not os.path.exists(body_path):
+            return None
+        meta = self._load_meta(meta_path)
+        return FeedResult(url, False, body_path, meta.get('status', 200), sha256=meta.get('sha256'))
+
+    def fetch(self, url: str, timeout: float = 30, **kwargs) -> FeedResult:
+        """
+        Fetch a URL, reusing the cached copy when it has not changed.
+
+        The body is streamed to disk in chunks while it is hashed, so large
+        feeds are never held in memory.
+
+        Args:
+            url: Feed URL
+            timeout: Request timeout in seconds
+            **kwargs: Extra arguments for requests (headers, params, ...)
+
+        Returns:
+            FeedResult describing the cached body
+
+        Raises:
+            requests.RequestException: If the request fails
+        """
+        body_path, meta_path = self._paths(url)
+        meta = self._load_meta(meta_path) if os.path.exists(body_path) else {}
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        with self.session.get(url, headers=headers, timeout=timeout, stream=True, **kwargs) as response:
+            if response.status_code == 304 and meta:
+                self.logger.debug(f"Not modified: {url}")
+                return FeedResult(url, False, body_path, meta.get('status', 200), response.headers,
+                                  meta.get('sha256'))
+
+            response.raise_for_status()
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            digest = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                        digest.update(chunk)
+                        f.write(chunk)
+
+                sha256 = digest.hexdigest()
+                changed = sha256 != meta.get('sha256')
+
+                if changed:
+                    os.replace(tmp_path, body_path)
+                else:
+                    os.remove(tmp_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            self._save_meta(meta_path, {
+                'url': url,
+                'status': response.status_code,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'sha256': sha256,
+                'fetched_at': int(time.time())
+            })
+
+        if not changed:
+            self.logger.debug(f"Content unchanged: {url}")
+        return FeedResult(url, changed, body_path, response.status_code, response.headers, sha256)
+
+    def _save_meta(self, meta_path: str, meta: Dict[str, Any]):
+        """
+        Atomically write cached metadata.
+
+        Args:
+            meta_path: Metadata file path
+            meta: Metadata dictionary
+        """
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
@@ -2,9 +2,9 @@
 IPsum collector - fetches IPs from stamparm/ipsum GitHub repository.
 """
 import requests
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import Iterator, Tuple
 from .base import BaseCollector
+from ..utils.batch import IPBatch
 
 
 class IpsumCollector(BaseCollector):
@@ -19,55 +19,83 @@ class IpsumCollector(BaseCollector):
     def name(self) -> str:
         return "ipsum"
 
-    def fetch(self) -> List[Dict[str, Any]]:
+    def fetch(self) -> IPBatch:
         """
         Fetch IPs from IPsum.
         
         Returns:
-            List of IP dictionaries
+            Batch of IPs
+        """
+        result = IPBatch(self.name)
+        for batch in self.fetch_batches():
+            result.extend(batch)
+        return result
+
+    def fetch_batches(self) -> Iterator[IPBatch]:
+        """
+        Stream IPs from IPsum in batches of BATCH_SIZE.
+        
+        The feed is parsed line by line from the on-disk cache, so peak
+        memory does not depend on the feed size.
+        
+        Yields:
+            Batches of IPs
         """
         self.log_info("Starting to fetch IPs from IPsum...")
         
         min_score = self.config.get('min_score', 3)
-        ips = []
+        count = 0
         
         try:
-            response = requests.get(self.IPSUM_URL, timeout=30)
-            response.raise_for_status()
+            feed = self.fetch_feed(self.IPSUM_URL, timeout=30)
+            
+            # Upstream only updates once a day; skip parsing and ingest
+            fingerprint = self.feed_fingerprint(feed, {'min_score': min_score})
+            if self.is_stored(self.name, fingerprint):
+                self.log_info("Feed not modified since last stored, skipping")
+                return
             
-            lines = response.text.strip().split('\n')
+            records = self._parse(feed.iter_lines(), min_score)
             
-            for line in lines:
-                # Skip comments and empty lines
-                if line.startswith('#') or not line.strip():
-                    continue
-                
-                # Format: IP\tSCORE
-                parts = line.split('\t')
-                if len(parts) != 2:
-                    continue
-                
-                ip_address = parts[0].strip()
-                try:
-                    score = int(parts[1].strip())
-                except ValueError:
-                    continue
-                
-                # Filter by minimum score
-                if score >= min_score:
-                    ips.append({
-                        'ip': ip_address,
-                        'source': self.name,
-                        'score': score,
-                        'last_seen': datetime.now()
-                    })
+            for batch in self.make_batches(records):
+                count += len(batch)
+                yield batch
             
-            self.log_info(f"Successfully fetched {len(ips)} IPs (min_score={min_score})")
-            return ips
+            self.mark_parsed(self.name, fingerprint)
+            self.log_info(f"Successfully fetched {count} IPs (min_score={min_score})")
             
         except requests.RequestException as e:
             self.log_error(f"Failed to fetch IPs: {e}")
-            return []
         except Exception as e:
             self.log_error(f"Unexpected error: {e}")
-            return []
+
+    @staticmethod
+    def _parse(lines: Iterator[str], min_score: int) -> Iterator[Tuple[str, int]]:
+        """
+        Parse feed lines into (ip, score) pairs.
+        
+        Args:
+            lines: Feed lines
+            min_score: Minimum score to keep
+            
+        Yields:
+            IP address strings with their scores
+        """
+        for line in lines:
+            # Skip comments and empty lines
+            if line.startswith('#') or not line.strip():
+                continue
+            
+            # Format: IP\tSCORE
+            parts = line.split('\t')
+            if len(parts) != 2:
+                continue
+            
+            try:
+                score = int(parts[1])
+            except ValueError:
+                continue
+            
+            # Filter by minimum score
+            if score >= min_score:
+                yield parts[0], score
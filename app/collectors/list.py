@@ -0,0 +1,273 @@
+"""
+List collector - fetches IPs from plain text, CSV or CIDR lists.
+"""
+import mmap
+import os
+import requests
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .base import BaseCollector
+from ..utils.batch import IPBatch, to_epoch
+from ..utils.iputils import network_bounds, PackedIP
+
+
+class ListCollector(BaseCollector):
+    """
+    Collector for generic IP lists (FireHOL, Spamhaus DROP/EDROP, Emerging
+    Threats, internal lists, ...).
+
+    Each feed is a URL (downloaded through the feed cache) or a local file
+    (memory-mapped) with its own format rules. Feeds are parsed line by
+    line and tagged with their own source name.
+
+    Networks up to max_cidr_addresses are expanded into addresses, which
+    are scored and aggregated like any other; larger ones are stored as
+    address ranges (cidr: network stores every network as a range).
+    """
+
+    # Format rules a feed may override; collector-level values are defaults
+    FEED_DEFAULTS = {
+        'comment': '#',
+        'delimiter': None,
+        'column': 0,
+        'cidr': 'expand',
+        'max_cidr_addresses': 256,
+        'score': 5,
+        'score_column': None,
+        'score_map': None,
+        'timeout': 60,
+    }
+
+    CIDR_MODES = ('expand', 'network', 'skip')
+
+    @property
+    def name(self) -> str:
+        return "list"
+
+    def fetch(self) -> List[IPBatch]:
+        """
+        Fetch IPs from every configured list.
+        
+        Returns:
+            One batch per feed
+        """
+        results: Dict[str, IPBatch] = {}
+        for batch in self.fetch_batches():
+            result = results.get(batch.source)
+            if result is None:
+                result = results[batch.source] = IPBatch(batch.source, batch.last_seen)
+            result.extend(batch)
+        return list(results.values())
+
+    def fetch_batches(self) -> Iterator[IPBatch]:
+        """
+        Stream IPs from every configured list in batches of BATCH_SIZE.
+        
+        A failing feed is logged and skipped without affecting the others.
+        
+        Yields:
+            Batches of IPs tagged with the feed name
+        """
+        feeds = self.config.get('feeds') or []
+        if not feeds:
+            self.log_error("No feeds configured")
+            return
+        
+        for feed in feeds:
+            name = feed.get('name')
+            if not name or not (feed.get('url') or feed.get('path')):
+                self.log_error(f"Feed needs a name and a url or path: {feed}")
+                continue
+            
+            rules = self._feed_rules(feed)
+            if rules['cidr'] not in self.CIDR_MODES:
+                self.log_error(f"[{name}] Unknown cidr mode '{rules['cidr']}', "
+                               f"expected one of {', '.join(self.CIDR_MODES)}")
+                continue
+            
+            try:
+                yield from self._fetch_feed(name, feed, rules)
+            except requests.RequestException as e:
+                self.log_error(f"[{name}] Failed to fetch list: {e}")
+            except OSError as e:
+                self.log_error(f"[{name}] Failed to read list: {e}")
+            except Exception as e:
+                self.log_error(f"[{name}] Unexpected error: {e}")
+
+    def _feed_rules(self, feed: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resolve the format rules of a feed.
+        
+        Args:
+            feed: Feed configuration
+        
+        Returns:
+            Rules with feed values over collector values over FEED_DEFAULTS
+        """
+        return {
+            key: feed.get(key, self.config.get(key, default))
+            for key, default in self.FEED_DEFAULTS.items()
+        }
+
+    def _fetch_feed(self, name: str, feed: Dict[str, Any],
+                    rules: Dict[str, Any]) -> Iterator[IPBatch]:
+        """
+        Stream one feed.
+        
+        Args:
+            name: Feed name, used as the source tag
+            feed: Feed configuration
+            rules: Resolved format rules
+        
+        Yields:
+            Batches of IPs
+        """
+        self.log_info(f"[{name}] Starting to fetch list...")
+        
+        fingerprint = None
+        if feed.get('url'):
+            result = self.fetch_feed(feed['url'], timeout=rules['timeout'])
+            fingerprint = self.feed_fingerprint(result, rules)
+            if self.is_stored(name, fingerprint):
+                self.log_info(f"[{name}] List not modified since last stored, skipping")
+                return
+            lines = result.iter_lines()
+        else:
+            lines = self._iter_file_lines(feed['path'])
+        
+        count = 0
+        networks = 0
+        skipped_cidrs = []
+        last_seen = to_epoch()
+        batch = IPBatch(name, last_seen)
+        
+        for value, score in self._parse(lines, rules):
+            if '/' not in value:
+                batch.add(value, score)
+            elif rules['cidr'] != 'skip':
+                try:
+                    first, last = network_bounds(value)
+                except ValueError:
+                    skipped_cidrs.append(value)
+                    continue
+                
+                addresses = self._expand(first, last, rules)
+                if addresses is None:
+                    batch.add_network(first, last, score)
+                    networks += 1
+                else:
+                    for packed in addresses:
+                        batch.add_packed(packed, score)
+            else:
+                skipped_cidrs.append(value)
+            
+            if len(batch) >= self.BATCH_SIZE:
+                count += len(batch)
+                yield batch
+                batch = IPBatch(name, last_seen)
+        
+        if len(batch) or batch.invalid:
+            count += len(batch)
+            yield batch
+        
+        if fingerprint:
+            self.mark_parsed(name, fingerprint)
+        
+        self.log_info(f"[{name}] Successfully fetched {count} entries "
+                      f"({networks} stored as networks)")
+        
+        if skipped_cidrs:
+            examples = ', '.join(skipped_cidrs[:5])
+            self.log_warning(f"[{name}] Skipped {len(skipped_cidrs)} networks that are not blocked "
+                             f"(cidr: {rules['cidr']} or malformed), e.g. {examples}")
+
+    @staticmethod
+    def _iter_file_lines(path: str) -> Iterator[str]:
+        """
+        Stream the lines of a local file through a read-only memory map.
+        
+        Args:
+            path: File path
+        
+        Yields:
+            Lines without trailing newline characters
+        """
+        with open(path, 'rb') as f:
+            # Empty files cannot be mapped
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b''):
+                    yield line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    @staticmethod
+    def _parse(lines: Iterator[str], rules: Dict[str, Any]) -> Iterator[Tuple[str, int]]:
+        """
+        Parse list lines into (address or network, score) pairs.
+        
+        Args:
+            lines: List lines
+            rules: Resolved format rules
+        
+        Yields:
+            Address or CIDR strings with their scores
+        """
+        comment = rules['comment']
+        delimiter = rules['delimiter']
+        column = rules['column']
+        default_score = rules['score']
+        score_column = rules['score_column']
+        score_map = rules['score_map'] or {}
+        
+        for line in lines:
+            # Strip full-line and trailing comments
+            if comment:
+                line = line.split(comment, 1)[0]
+            if not line.strip():
+                continue
+            
+            parts = line.split(delimiter)
+            try:
+                value = parts[column].strip().strip('"\'')
+            except IndexError:
+                continue
+            if not value:
+                continue
+            
+            score = default_score
+            if score_column is not None:
+                try:
+                    raw = parts[score_column].strip().strip('"\'')
+                    score = score_map[raw] if raw in score_map else int(raw)
+                except (IndexError, ValueError):
+                    score = default_score
+            
+            yield value, score
+
+    @staticmethod
+    def _expand(first: PackedIP, last: PackedIP, rules: Dict[str, Any]) -> Optional[Iterator[PackedIP]]:
+        """
+        Expand a network into packed addresses according to the CIDR rules.
+        
+        Args:
+            first: First packed address of the network
+            last: Last packed address of the network
+            rules: Resolved format rules
+        
+        Returns:
+            Iterator of packed addresses, or None if the network is stored
+            as a range (cidr: network or more than max_cidr_addresses)
+        """
+        if rules['cidr'] == 'network':
+            return None
+        
+        if isinstance(first, int):
+            if last - first + 1 > rules['max_cidr_addresses']:
+                return None
+            return iter(range(first, last + 1))
+        
+        start = int.from_bytes(first, 'big')
+        end = int.from_bytes(last, 'big')
+        if end - start + 1 > rules['max_cidr_addresses']:
+            return None
+        return (value.to_bytes(16, 'big') for value in range(start, end + 1))
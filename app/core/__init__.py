@@ -2,12 +2,19 @@
 Core module - contains engine, config, and database.
 """
 from .config import Config
+from .connection import ConnectionManager
 from .database import IPDatabase
+from .cache import BlocklistSnapshot, SnapshotCache
+from .allowlist import Allowlist
 from .engine import Engine
 
 
 __all__ = [
     'Config',
+    'ConnectionManager',
     'IPDatabase',
+    'BlocklistSnapshot',
+    'SnapshotCache',
+    'Allowlist',
     'Engine',
 ]
@@ -0,0 +1,169 @@
+"""
+Allowlist of networks that must never be pushed to the firewalls.
+"""
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import ipaddress
+import logging
+
+import requests
+
+from ..collectors.http_cache import FeedCache
+from ..utils.bogons import RangeSet
+from ..utils.iputils import PackedIP, PackedRange
+
+
+# Address or CIDR tokens inside plain text, CSV or JSON range files
+NETWORK_PATTERN = re.compile(r'[0-9A-Fa-f:.]*[.:][0-9A-Fa-f:.]*(?:/\d{1,3})?')
+
+
+class Allowlist:
+    """
+    Networks exempt from blocking: our egress IPs, partners, CDNs, DNS
+    resolvers, ...
+
+    Networks come from the config, local files and optionally fetched
+    range files (e.g. cloud provider IP ranges), and are compiled into one
+    RangeSet (merged, sorted interval tables) so a blocklist of a million
+    entries is filtered with one binary search per entry. Files and URLs
+    are re-read at most every refresh_interval seconds.
+    """
+
+    def __init__(self, config: Dict[str, Any], cache_dir: str = 'data/cache'):
+        """
+        Initialize the allowlist.
+        
+        Args:
+            config: Allowlist configuration (networks, files, urls,
+                refresh_interval)
+            cache_dir: Directory for downloaded range files
+        """
+        self.networks = config.get('networks') or []
+        self.files = config.get('files') or []
+        self.urls = config.get('urls') or []
+        self.refresh_interval = config.get('refresh_interval', 86400)
+        self.logger = logging.getLogger("allowlist")
+        
+        self.feed_cache = FeedCache(os.path.join(cache_dir, 'allowlist'))
+        self.ranges: Optional[RangeSet] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        
+        # Metrics
+        self.suppressed_last = 0
+        self.suppressed_total = 0
+
+    def is_configured(self) -> bool:
+        """Check if any allowlist source is configured."""
+        return bool(self.networks or self.files or self.urls)
+
+    def get_ranges(self) -> RangeSet:
+        """
+        Get the compiled allowlist, reloading it when it is due.
+        
+        Returns:
+            Compiled ranges
+        """
+        with self._lock:
+            if self.ranges is None or time.monotonic() - self._loaded_at >= self.refresh_interval:
+                self.ranges = self._compile()
+                self._loaded_at = time.monotonic()
+            return self.ranges
+
+    def _compile(self) -> RangeSet:
+        """
+        Read every source and compile the networks.
+        
+        A source that fails to load is logged and skipped; if a URL cannot
+        be fetched, its last downloaded copy is used.
+        
+        Returns:
+            Compiled ranges
+        """
+        networks = list(self._parse(self.networks, 'config'))
+        
+        for path in self.files:
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    lines = [line.split('#', 1)[0] for line in f]
+                networks.extend(self._parse(lines, path))
+            except OSError as e:
+                self.logger.error(f"Failed to read allowlist file {path}: {e}")
+        
+        for url in self.urls:
+            try:
+                feed = self.feed_cache.fetch(url, timeout=60)
+            except requests.RequestException as e:
+                self.logger.error(f"Failed to fetch allowlist {url}: {e}")
+                feed = self.feed_cache.get_cached(url)
+                if feed is None:
+                    continue
+            networks.extend(self._parse(feed.iter_lines(), url))
+        
+        ranges = RangeSet(networks)
+        self.logger.info(f"Loaded {len(networks)} allowlisted networks ({len(ranges)} ranges)")
+        return ranges
+
+    def _parse(self, lines: Iterable[str], origin: str) -> Iterator[str]:
+        """
+        Extract valid networks from text.
+        
+        Args:
+            lines: Lines or single entries of text
+            origin: Where the text came from, for logging
+        
+        Yields:
+            Normalized network strings
+        """
+        invalid = 0
+        for line in lines:
+            for token in NETWORK_PATTERN.findall(str(line)):
+                try:
+                    yield str(ipaddress.ip_network(token, strict=False))
+                except ValueError:
+                    invalid += 1
+        
+        if invalid:
+            self.logger.debug(f"Ignored {invalid} invalid entries in {origin}")
+
+    def filter(self, ips: Sequence[Union[PackedIP, PackedRange]]
+               ) -> Tuple[List[Union[PackedIP, PackedRange]], int]:
+        """
+        Remove allowlisted addresses from a blocklist.
+        
+        Network ranges are cut to their parts outside the allowlist.
+        
+        Args:
+            ips: Packed addresses and (first, last) ranges, in any order
+        
+        Returns:
+            Tuple of (remaining addresses and ranges in input order, number
+            of addresses and ranges suppressed or cut)
+        """
+        if not self.is_configured():
+            return list(ips), 0
+        
+        kept, suppressed = self.get_ranges().filter(ips)
+        
+        self.suppressed_last = suppressed
+        self.suppressed_total += suppressed
+        if suppressed:
+            self.logger.info(f"Suppressed {suppressed} allowlisted IPs and networks "
+                             f"({self.suppressed_total} since start)")
+        return kept, suppressed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get allowlist metrics.
+        
+        Returns:
+            Dictionary with 'ranges', 'suppressed_last' and 'suppressed_total'
+        """
+        return {
+            'ranges': len(self.ranges) if self.ranges is not None else 0,
+            'suppressed_last': self.suppressed_last,
+            'suppressed_total': self.suppressed_total,
+        }
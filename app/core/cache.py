@@ -0,0 +1,257 @@
+"""
+In-memory snapshot cache in front of the IP database.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+import logging
+
+from .database import IPDatabase
+from ..utils.iputils import pack_ip, unpack_ip, PackedIP, PackedRange
+
+
+class BlocklistSnapshot:
+    """
+    Immutable, array-backed list of IPs for one score threshold.
+
+    IPv4 addresses are kept in an array('I') and IPv6 addresses in one
+    contiguous bytes object (16 bytes each), both in rank order (see
+    IPDatabase.RANK_ORDER) with parallel score and rank arrays. Membership
+    lookups use sorted copies built on first use. Stored networks are kept
+    as a separate ranked list of (first, last, score) tuples.
+    """
+
+    def __init__(self, rows: List[Tuple[PackedIP, int]], min_score: int,
+                 generation: Optional[int],
+                 networks: Optional[List[Tuple[PackedIP, PackedIP, int]]] = None):
+        """
+        Build a snapshot from ranked database rows.
+
+        Args:
+            rows: (packed ip, score) tuples, best ranked first
+            min_score: Score threshold the rows were selected with
+            generation: Database generation the rows were read at, None for
+                the empty stand-in of a failed read
+            networks: (packed first, packed last, score) tuples, best
+                ranked first
+        """
+        self.min_score = min_score
+        self.generation = generation
+        self.networks = networks or []
+
+        self._v4 = array('I')
+        self._v4_scores = array('H')
+        self._v4_ranks = array('I')
+        v6 = bytearray()
+        self._v6_scores = array('H')
+        self._v6_ranks = array('I')
+
+        for rank, (ip, score) in enumerate(rows):
+            if isinstance(ip, int):
+                self._v4.append(ip)
+                self._v4_scores.append(score)
+                self._v4_ranks.append(rank)
+            else:
+                v6 += ip
+                self._v6_scores.append(score)
+                self._v6_ranks.append(rank)
+
+        self._v6 = bytes(v6)
+        self._v4_sorted: Optional[array] = None
+        self._v6_sorted: Optional[List[bytes]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._v4) + len(self._v6_scores)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate IP address strings, best ranked first."""
+        for ip, _ in self.iter_ranked():
+            yield unpack_ip(ip)
+
+    def iter_ranked(self) -> Iterator[Tuple[PackedIP, int]]:
+        """
+        Iterate (packed ip, score) tuples, best ranked first.
+
+        Yields:
+            Packed addresses of both families merged by rank
+        """
+        v4, v4_scores, v4_ranks = self._v4, self._v4_scores, self._v4_ranks
+        v6, v6_scores, v6_ranks = self._v6, self._v6_scores, self._v6_ranks
+        i = j = 0
+
+        while i < len(v4) or j < len(v6_scores):
+            if j >= len(v6_scores) or (i < len(v4) and v4_ranks[i] < v6_ranks[j]):
+                yield v4[i], v4_scores[i]
+                i += 1
+            else:
+                yield v6[j * 16:(j + 1) * 16], v6_scores[j]
+                j += 1
+
+    def iter_entries(self) -> Iterator[Union[PackedIP, PackedRange]]:
+        """
+        Iterate addresses and network ranges, best ranked first.
+
+        Networks are merged by score, ahead of addresses with the same
+        score since they are reported as whole blocks.
+
+        Yields:
+            Packed addresses and (first, last) ranges
+        """
+        networks = self.networks
+        index = 0
+
+        for ip, score in self.iter_ranked():
+            while index < len(networks) and networks[index][2] >= score:
+                yield networks[index][:2]
+                index += 1
+            yield ip
+
+        for first, last, _ in networks[index:]:
+            yield first, last
+
+    def to_list(self) -> List[str]:
+        """
+        Get the snapshot as a list of IP address strings.
+
+        Returns:
+            IP addresses, best ranked first
+        """
+        return list(self)
+
+    def __contains__(self, ip: str) -> bool:
+        """
+        Check whether an IP address is in the snapshot.
+
+        Args:
+            ip: IP address string
+
+        Returns:
+            True if the address or a network containing it is present
+        """
+        packed = pack_ip(ip)
+        if packed is None:
+            return False
+
+        # Netblock lists are short, a scan is cheap
+        for first, last, _ in self.networks:
+            if type(first) is type(packed) and first <= packed <= last:
+                return True
+
+        with self._lock:
+            if isinstance(packed, int):
+                if self._v4_sorted is None:
+                    self._v4_sorted = array('I', sorted(self._v4))
+                index = bisect_left(self._v4_sorted, packed)
+                return index < len(self._v4_sorted) and self._v4_sorted[index] == packed
+
+            if self._v6_sorted is None:
+                self._v6_sorted = sorted(self._v6[k:k + 16] for k in range(0, len(self._v6), 16))
+            index = bisect_left(self._v6_sorted, packed)
+            return index < len(self._v6_sorted) and self._v6_sorted[index] == packed
+
+
+class SnapshotCache:
+    """
+    Cache of blocklist snapshots and stats keyed by database generation.
+
+    Entries stay valid until a write changes the database generation, so
+    repeated reads within one generation never touch SQLite.
+    """
+
+    def __init__(self, db: IPDatabase):
+        """
+        Initialize the cache.
+
+        Args:
+            db: Database to read from
+        """
+        self.db = db
+        self.logger = logging.getLogger("cache")
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._snapshots: Dict[int, BlocklistSnapshot] = {}
+        self._stats: Optional[Dict[str, Any]] = None
+
+    def _check_generation(self) -> int:
+        """
+        Drop every cached entry if the database generation moved.
+
+        Must be called with the lock held.
+
+        Returns:
+            Generation the cached entries belong to
+        """
+        generation = self.db.get_generation()
+        if generation != self._generation:
+            self._snapshots.clear()
+            self._stats = None
+            self._generation = generation
+        return generation
+
+    def get_snapshot(self, min_score: int = 0) -> BlocklistSnapshot:
+        """
+        Get the blocklist snapshot for a score threshold.
+
+        Args:
+            min_score: Minimum score threshold
+
+        Returns:
+            Snapshot of the current generation; if the database read fails,
+            an empty snapshot with generation None that is not cached
+        """
+        with self._lock:
+            generation = self._check_generation()
+            snapshot = self._snapshots.get(min_score)
+
+            if snapshot is None:
+                rows = self.db.get_ranked_ips(min_score=min_score)
+                networks = self.db.get_ranked_networks(min_score=min_score)
+                if rows is None or networks is None:
+                    return BlocklistSnapshot([], min_score, None)
+                snapshot = BlocklistSnapshot(rows, min_score, generation, networks)
+                self._snapshots[min_score] = snapshot
+                self.logger.debug(f"Built snapshot of {len(snapshot)} IPs and "
+                                  f"{len(networks)} networks "
+                                  f"(min_score={min_score}, generation={generation})")
+
+            return snapshot
+
+    def get_all_ips(self, min_score: int = 0) -> List[str]:
+        """
+        Get all IP addresses, best ranked first.
+
+        Args:
+            min_score: Minimum score threshold
+
+        Returns:
+            List of IP addresses
+        """
+        return self.get_snapshot(min_score).to_list()
+
+    def contains(self, ip: str, min_score: int = 0) -> bool:
+        """
+        Check whether an IP address is blocked at a score threshold.
+
+        Args:
+            ip: IP address string
+            min_score: Minimum score threshold
+
+        Returns:
+            True if the address is in the blocklist
+        """
+        return ip in self.get_snapshot(min_score)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get database statistics.
+
+        Returns:
+            Dictionary with stats (see IPDatabase.get_stats)
+        """
+        with self._lock:
+            self._check_generation()
+            if self._stats is None:
+                self._stats = self.db.get_stats()
+            return self._stats
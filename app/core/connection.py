@@ -0,0 +1,139 @@
+"""
+SQLite connection management module.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+import logging
+
+
+class ConnectionManager:
+    """
+    Persistent, thread-safe SQLite connections for one database file.
+
+    The database runs in WAL mode with a single shared writer connection
+    (serialized by a lock) and one reader connection per thread, so readers
+    never block the writer and the writer never blocks readers.
+    """
+
+    # Prepared statements kept per connection for reuse
+    CACHED_STATEMENTS = 256
+
+    def __init__(self, db_path: str, mmap_size: int = 256 * 1024 * 1024,
+                 cache_size_kb: int = 64 * 1024, busy_timeout: float = 30.0):
+        """
+        Initialize the connection manager.
+
+        Args:
+            db_path: Path to SQLite database file
+            mmap_size: Bytes of the database file to memory-map
+            cache_size_kb: Page cache size per connection in KiB
+            busy_timeout: Seconds to wait for a lock before failing
+        """
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout = busy_timeout
+        self.logger = logging.getLogger("database")
+
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+        self._writer = self._connect(check_same_thread=False)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        """
+        Open a new connection and apply the performance pragmas.
+
+        Args:
+            check_same_thread: Restrict the connection to the creating thread
+
+        Returns:
+            SQLite connection in autocommit mode
+        """
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=check_same_thread,
+            cached_statements=self.CACHED_STATEMENTS
+        )
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a write transaction on the shared writer connection.
+
+        The transaction is committed when the block exits normally and
+        rolled back if it raises. Nested use from the same thread joins the
+        outer transaction.
+
+        Yields:
+            Writer connection inside an open transaction
+        """
+        with self._write_lock:
+            if self._writer.in_transaction:
+                yield self._writer
+                return
+
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            else:
+                self._writer.execute("COMMIT")
+
+    @contextmanager
+    def exclusive(self) -> Iterator[sqlite3.Connection]:
+        """
+        Hold the writer connection without opening a transaction.
+
+        Used for statements that cannot run inside a transaction, such as
+        VACUUM or changing auto_vacuum.
+
+        Yields:
+            Writer connection in autocommit mode
+        """
+        with self._write_lock:
+            yield self._writer
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        Get the reader connection of the calling thread.
+
+        Returns:
+            Autocommit connection owned by the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def close(self):
+        """Close the writer and every reader connection."""
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+
+        for conn in readers:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Created in another thread that is still alive
+                pass
+
+        with self._write_lock:
+            self._writer.close()
@@ -2,121 +2,838 @@
 Database module for storing malicious IPs.
 """
 import sqlite3
-from typing import List, Dict, Any
-from datetime import datetime
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Optional
 import logging
 
+from .connection import ConnectionManager
+from ..utils.iputils import pack_ip, unpack_ip, network_bounds
+from ..utils.iterutils import batched
+from ..utils.batch import IPBatch, IPRecords, as_batches
+
 
 class IPDatabase:
     """
     SQLite database for managing malicious IP addresses.
     """
 
-    def __init__(self, db_path: str = "data/ips.db"):
+    # Version stored in PRAGMA user_version for migrations
+    SCHEMA_VERSION = 5
+
+    # Number of rows staged and merged per upsert round
+    BATCH_SIZE = 50000
+
+    # Tables renamed to <name>_old and re-imported during migrations
+    MIGRATED_TABLES = ('malicious_ips', 'ip_sightings')
+
+    # Generations of removal tombstones kept in the change log
+    CHANGE_LOG_RETENTION = 1000
+
+    # Rows deleted per transaction by cleanup_old_ips
+    CLEANUP_BATCH_SIZE = 5000
+
+    # Deterministic blocklist ranking: score, then number of sources, then
+    # most recently listed, with the address as final tie-breaker. Every key
+    # only changes with the IP's data (created_at is fixed, unlike last_seen
+    # which every re-ingest moves), so a top-N selection does not churn
+    # between cycles
+    RANK_ORDER = "score DESC, source_count DESC, created_at DESC, ip_address"
+
+    def __init__(self, db_path: str = "data/ips.db", **connection_options):
         """
         Initialize database connection.
         
         Args:
             db_path: Path to SQLite database file
+            **connection_options: Tuning options passed to ConnectionManager
+                (mmap_size, cache_size_kb, busy_timeout)
         """
         self.db_path = db_path
         self.logger = logging.getLogger("database")
+        self.connections = ConnectionManager(db_path, **connection_options)
+        self._generation = 0
+        self._generation_lock = threading.Lock()
         self._init_db()
 
     def _init_db(self):
-        """Initialize database schema."""
+        """Initialize database schema, migrating older layouts if needed."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create malicious_ips table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS malicious_ips (
-                    ip_address TEXT PRIMARY KEY,
-                    sources TEXT NOT NULL,
-                    score INTEGER NOT NULL,
-                    last_seen TIMESTAMP NOT NULL,
-                    created_at TIMESTAMP NOT NULL
-                )
-            """)
-            
-            # Create index for faster queries
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_last_seen 
-                ON malicious_ips(last_seen)
-            """)
+            self._enable_incremental_vacuum()
             
-            conn.commit()
-            conn.close()
+            with self.connections.writer() as conn:
+                cursor = conn.cursor()
+                
+                version = cursor.execute("PRAGMA user_version").fetchone()[0]
+                legacy = version < self.SCHEMA_VERSION and self._table_exists(cursor, 'malicious_ips')
+                
+                if legacy:
+                    self.logger.info(f"Migrating database schema from version {version} "
+                                     f"to {self.SCHEMA_VERSION}...")
+                
+                # Versions without an importer only need additive changes
+                importer = getattr(self, f'_import_v{version}', None) if legacy else None
+                
+                if importer:
+                    conn.create_function('pack_ip', 1, pack_ip, deterministic=True)
+                    old_tables = self._detach_tables(cursor)
+                
+                self._create_schema(cursor)
+                
+                if importer:
+                    importer(cursor)
+                    for table in old_tables:
+                        cursor.execute(f"DROP TABLE {table}")
+                
+                if legacy and version < 4:
+                    self._convert_timestamps(cursor)
+                
+                cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+                
+                cursor.execute("SELECT value FROM meta WHERE key = 'generation'")
+                self._generation = cursor.fetchone()[0]
             
             self.logger.info(f"Database initialized at {self.db_path}")
-            
+        
         except sqlite3.Error as e:
             self.logger.error(f"Failed to initialize database: {e}")
             raise
 
-    def add_ips(self, ips: List[Dict[str, Any]]):
+    def _enable_incremental_vacuum(self):
+        """
+        Switch the database file to incremental auto-vacuum.
+        
+        The mode only takes effect after a VACUUM, which is run once per
+        file (cheap for new ones). Afterwards freed pages can be returned
+        with PRAGMA incremental_vacuum.
+        """
+        with self.connections.exclusive() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return
+            
+            if self._table_exists(conn.cursor(), 'malicious_ips'):
+                self.logger.info("Rebuilding database for incremental vacuum...")
+            
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+
+    def _create_schema(self, cursor: sqlite3.Cursor):
+        """
+        Create tables, indexes and triggers if they do not exist.
+        
+        Args:
+            cursor: Cursor of the schema transaction
+        """
+        # Aggregate view of each IP across all sources. ip_address holds an
+        # INTEGER for IPv4 and a 16-byte BLOB for IPv6 (see utils.iputils),
+        # clustered by address so CIDR lookups are primary key range scans.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS malicious_ips (
+                ip_address BLOB PRIMARY KEY,
+                score INTEGER NOT NULL,
+                source_count INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                created_at INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_last_seen
+            ON malicious_ips(last_seen)
+        """)
+        
+        # One row per IP and reporting source
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ip_sightings (
+                ip_address BLOB NOT NULL,
+                source TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                PRIMARY KEY (ip_address, source)
+            ) WITHOUT ROWID
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sightings_source
+            ON ip_sightings(source)
+        """)
+        
+        # Networks too large to expand into addresses, one row per network
+        # and reporting source, keyed by their packed first and last address
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS network_sightings (
+                first_address BLOB NOT NULL,
+                last_address BLOB NOT NULL,
+                source TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                created_at INTEGER NOT NULL,
+                PRIMARY KEY (first_address, last_address, source)
+            ) WITHOUT ROWID
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_networks_source
+            ON network_sightings(source)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_networks_last_seen
+            ON network_sightings(last_seen)
+        """)
+        
+        # Counters maintained by triggers so stats never scan the tables
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS source_counts (
+                source TEXT PRIMARY KEY,
+                ip_count INTEGER NOT NULL
+            )
+        """)
+        
+        # Content and parse settings of the last feed stored per source, so
+        # an unchanged feed is only skipped while its entries are stored
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS feed_state (
+                source TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        
+        cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('total_ips', 0)")
+        cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+        cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('pruned_generation', 0)")
+        
+        # Generation in which each IP was last added, rescored or removed
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ip_changes (
+                ip_address BLOB PRIMARY KEY,
+                generation INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_changes_generation
+            ON ip_changes(generation)
+        """)
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_sightings_insert
+            AFTER INSERT ON ip_sightings
+            BEGIN
+                INSERT INTO source_counts (source, ip_count) VALUES (NEW.source, 1)
+                ON CONFLICT(source) DO UPDATE SET ip_count = ip_count + 1;
+            END
+        """)
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_sightings_delete
+            AFTER DELETE ON ip_sightings
+            BEGIN
+                UPDATE source_counts SET ip_count = ip_count - 1
+                WHERE source = OLD.source;
+            END
+        """)
+        
+        # Networks count towards their source like addresses
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_networks_insert
+            AFTER INSERT ON network_sightings
+            BEGIN
+                INSERT INTO source_counts (source, ip_count) VALUES (NEW.source, 1)
+                ON CONFLICT(source) DO UPDATE SET ip_count = ip_count + 1;
+            END
+        """)
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_networks_delete
+            AFTER DELETE ON network_sightings
+            BEGIN
+                UPDATE source_counts SET ip_count = ip_count - 1
+                WHERE source = OLD.source;
+            END
+        """)
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_ips_insert
+            AFTER INSERT ON malicious_ips
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'total_ips';
+            END
+        """)
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_ips_delete
+            AFTER DELETE ON malicious_ips
+            BEGIN
+                UPDATE meta SET value = value - 1 WHERE key = 'total_ips';
+            END
+        """)
+
+    def _detach_tables(self, cursor: sqlite3.Cursor) -> List[str]:
+        """
+        Rename the tables of an older schema out of the way.
+        
+        Their indexes and triggers are dropped so the current schema can be
+        created under the same names, and the trigger-maintained counters
+        are reset because re-importing the rows rebuilds them.
+        
+        Args:
+            cursor: Cursor of the migration transaction
+        
+        Returns:
+            Names of the renamed tables
+        """
+        old_tables = []
+        
+        for table in self.MIGRATED_TABLES:
+            if not self._table_exists(cursor, table):
+                continue
+            
+            cursor.execute("""
+                SELECT type, name FROM sqlite_master
+                WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+            """, (table,))
+            for kind, name in cursor.fetchall():
+                cursor.execute(f"DROP {kind.upper()} {name}")
+            
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+            old_tables.append(f"{table}_old")
+        
+        cursor.execute("DROP TABLE IF EXISTS source_counts")
+        if self._table_exists(cursor, 'meta'):
+            cursor.execute("DELETE FROM meta WHERE key = 'total_ips'")
+        
+        return old_tables
+
+    def _import_v0(self, cursor: sqlite3.Cursor):
+        """
+        Import rows of the original schema with comma-joined sources.
+        
+        Args:
+            cursor: Cursor of the migration transaction
+        """
+        cursor.execute("""
+            WITH RECURSIVE split(ip_address, score, last_seen, source, rest) AS (
+                SELECT pack_ip(ip_address), score, last_seen, '', sources || ','
+                FROM malicious_ips_old
+                WHERE pack_ip(ip_address) IS NOT NULL
+                UNION ALL
+                SELECT ip_address, score, last_seen,
+                       substr(rest, 1, instr(rest, ',') - 1),
+                       substr(rest, instr(rest, ',') + 1)
+                FROM split
+                WHERE rest <> ''
+            )
+            INSERT OR IGNORE INTO ip_sightings (ip_address, source, score, last_seen)
+            SELECT ip_address, source, score, last_seen
+            FROM split
+            WHERE source <> ''
+        """)
+        
+        cursor.execute("""
+            INSERT INTO malicious_ips
+            (ip_address, score, source_count, last_seen, created_at)
+            SELECT s.ip_address, o.score, COUNT(*), o.last_seen, o.created_at
+            FROM malicious_ips_old o
+            JOIN ip_sightings s ON s.ip_address = pack_ip(o.ip_address)
+            GROUP BY s.ip_address
+        """)
+
+    def _import_v1(self, cursor: sqlite3.Cursor):
+        """
+        Import rows of the sightings schema with TEXT addresses.
+        
+        Args:
+            cursor: Cursor of the migration transaction
+        """
+        cursor.execute("""
+            INSERT OR IGNORE INTO ip_sightings (ip_address, source, score, last_seen)
+            SELECT pack_ip(ip_address), source, score, last_seen
+            FROM ip_sightings_old
+            WHERE pack_ip(ip_address) IS NOT NULL
+        """)
+        
+        cursor.execute("""
+            INSERT OR IGNORE INTO malicious_ips
+            (ip_address, score, source_count, last_seen, created_at)
+            SELECT pack_ip(ip_address), score, source_count, last_seen, created_at
+            FROM malicious_ips_old
+            WHERE pack_ip(ip_address) IS NOT NULL
+        """)
+
+    def _convert_timestamps(self, cursor: sqlite3.Cursor):
+        """
+        Convert local-time timestamp strings to Unix epoch seconds.
+        
+        Older versions stored Python datetime strings in local time, which
+        could not be compared correctly with epoch-based cutoffs.
+        
+        Args:
+            cursor: Cursor of the migration transaction
+        """
+        epoch = "CAST(strftime('%s', {0}, 'utc') AS INTEGER)"
+        
+        cursor.execute(f"""
+            UPDATE malicious_ips SET
+                last_seen = {epoch.format('last_seen')},
+                created_at = {epoch.format('created_at')}
+            WHERE typeof(last_seen) = 'text' OR typeof(created_at) = 'text'
+        """)
+        
+        cursor.execute(f"""
+            UPDATE ip_sightings SET last_seen = {epoch.format('last_seen')}
+            WHERE typeof(last_seen) = 'text'
+        """)
+
+    @staticmethod
+    def _table_exists(cursor: sqlite3.Cursor, table: str) -> bool:
+        """
+        Check whether a table exists in the main schema.
+        
+        Args:
+            cursor: Database cursor
+            table: Table name
+        
+        Returns:
+            True if the table exists
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,)
+        )
+        return cursor.fetchone() is not None
+
+    def close(self):
+        """Close all database connections."""
+        self.connections.close()
+
+    def add_ips(self, ips: IPRecords) -> int:
         """
         Add or update IPs in the database.
         
+        Rows are loaded into a temporary staging table in batches of
+        BATCH_SIZE. Each batch is merged into ip_sightings with one
+        set-based upsert, then the aggregate rows of only the touched IPs
+        are recomputed, so the cost grows with the data volume rather than
+        per-row statements. Networks of the batches are merged into
+        network_sightings. Entries whose address cannot be parsed are
+        skipped.
+        
         Args:
-            ips: List of IP dictionaries from collectors
+            ips: An IPBatch, an iterable of IPBatch, or a list of legacy IP
+                dictionaries from collectors
+        
+        Returns:
+            Number of IPs and networks stored
         """
-        if not ips:
-            return
+        batches = as_batches(ips)
+        if not batches:
+            return 0
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            for ip_data in ips:
-                ip = ip_data['ip']
-                source = ip_data['source']
-                score = ip_data['score']
-                last_seen = ip_data['last_seen']
-                
-                # Check if IP exists
-                cursor.execute(
-                    "SELECT sources, score FROM malicious_ips WHERE ip_address = ?",
-                    (ip,)
-                )
-                result = cursor.fetchone()
-                
-                if result:
-                    # Update existing IP
-                    existing_sources = result[0]
-                    existing_score = result[1]
-                    
-                    # Merge sources
-                    sources_list = existing_sources.split(',')
-                    if source not in sources_list:
-                        sources_list.append(source)
-                    new_sources = ','.join(sources_list)
-                    
-                    # Update score (take maximum)
-                    new_score = max(existing_score, score)
-                    
-                    cursor.execute("""
-                        UPDATE malicious_ips 
-                        SET sources = ?, score = ?, last_seen = ?
-                        WHERE ip_address = ?
-                    """, (new_sources, new_score, last_seen, ip))
+            with self.connections.writer() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS staging_ips (
+                        ip_address BLOB NOT NULL,
+                        source TEXT NOT NULL,
+                        score INTEGER NOT NULL,
+                        last_seen INTEGER NOT NULL
+                    )
+                """)
+                
+                cursor.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS touched_ips (
+                        ip_address BLOB PRIMARY KEY,
+                        old_score INTEGER,
+                        old_source_count INTEGER
+                    ) WITHOUT ROWID
+                """)
+                
+                created_at = int(time.time())
+                generation = self._next_generation(cursor)
+                stored = 0
+                changed = 0
+                
+                for rows in batched(self._staging_rows(batches), self.BATCH_SIZE):
+                    cursor.executemany("INSERT INTO staging_ips VALUES (?, ?, ?, ?)", rows)
+                    stored += len(rows)
                     
-                else:
-                    # Insert new IP
-                    cursor.execute("""
-                        INSERT INTO malicious_ips 
-                        (ip_address, sources, score, last_seen, created_at)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (ip, source, score, last_seen, datetime.now()))
+                    changed += self._merge_staging(cursor, created_at, generation)
+                    cursor.execute("DELETE FROM staging_ips")
+                    cursor.execute("DELETE FROM touched_ips")
+                
+                networks = [
+                    (first, last, batch.source, score, batch.last_seen)
+                    for batch in batches for first, last, score in batch.networks
+                ]
+                if networks:
+                    stored += len(networks)
+                    changed += self._merge_networks(cursor, networks, created_at)
+                
+                if changed:
+                    self._commit_generation(cursor, generation)
             
-            conn.commit()
-            conn.close()
+            if changed:
+                self._publish_generation(generation)
             
-            self.logger.info(f"Added/updated {len(ips)} IPs in database")
+            skipped = sum(batch.invalid for batch in batches)
+            if skipped:
+                self.logger.warning(f"Skipped {skipped} entries with invalid IP addresses")
             
+            self.logger.info(f"Added/updated {stored} IPs in database "
+                             f"({changed} changed, generation {self._generation})")
+            return stored
+        
         except sqlite3.Error as e:
             self.logger.error(f"Failed to add IPs: {e}")
+            return 0
+
+    @staticmethod
+    def _staging_rows(batches: List[IPBatch]) -> Iterator[tuple]:
+        """
+        Flatten batches into staging rows.
+        
+        Args:
+            batches: Batches of packed IPs
+        
+        Yields:
+            Tuples of (packed ip, source, score, last_seen epoch seconds)
+        """
+        for batch in batches:
+            source, last_seen = batch.source, batch.last_seen
+            for packed, score in batch:
+                yield packed, source, score, last_seen
+
+    def _merge_staging(self, cursor: sqlite3.Cursor, created_at: int,
+                       generation: int) -> int:
+        """
+        Merge the staging table into ip_sightings and malicious_ips.
+        
+        Each sighting keeps the maximum score reported by its source. The
+        aggregate row takes the maximum score over all sources of the IP.
+        IPs that are new or whose aggregate score or source count changed
+        are recorded in the change log under the given generation.
+        
+        Args:
+            cursor: Cursor of the ingest transaction
+            created_at: Creation time (epoch seconds) for newly inserted IPs
+            generation: Generation to record changes under
+        
+        Returns:
+            Number of IPs recorded as changed
+        """
+        cursor.execute("""
+            INSERT INTO touched_ips (ip_address, old_score, old_source_count)
+            SELECT s.ip_address, m.score, m.source_count
+            FROM (SELECT DISTINCT ip_address FROM staging_ips) s
+            LEFT JOIN malicious_ips m ON m.ip_address = s.ip_address
+        """)
+        
+        cursor.execute("""
+            INSERT INTO ip_sightings (ip_address, source, score, last_seen)
+            SELECT ip_address, source, MAX(score), MAX(last_seen)
+            FROM staging_ips
+            WHERE true
+            GROUP BY ip_address, source
+            ON CONFLICT(ip_address, source) DO UPDATE SET
+                score = MAX(ip_sightings.score, excluded.score),
+                last_seen = MAX(ip_sightings.last_seen, excluded.last_seen)
+        """)
+        
+        cursor.execute("""
+            INSERT INTO malicious_ips
+            (ip_address, score, source_count, last_seen, created_at)
+            SELECT ip_address, MAX(score), COUNT(*), MAX(last_seen), ?
+            FROM ip_sightings
+            WHERE ip_address IN (SELECT ip_address FROM touched_ips)
+            GROUP BY ip_address
+            ON CONFLICT(ip_address) DO UPDATE SET
+                score = excluded.score,
+                source_count = excluded.source_count,
+                last_seen = excluded.last_seen
+        """, (created_at,))
+        
+        cursor.execute("""
+            INSERT INTO ip_changes (ip_address, generation)
+            SELECT t.ip_address, ?
+            FROM touched_ips t
+            JOIN malicious_ips m ON m.ip_address = t.ip_address
+            WHERE t.old_score IS NULL
+               OR t.old_score <> m.score
+               OR t.old_source_count <> m.source_count
+            ON CONFLICT(ip_address) DO UPDATE SET generation = excluded.generation
+        """, (generation,))
+        return cursor.rowcount
+
+    @staticmethod
+    def _merge_networks(cursor: sqlite3.Cursor, networks: List[tuple], created_at: int) -> int:
+        """
+        Merge networks into network_sightings.
+        
+        Like address sightings, each row keeps the maximum score reported
+        by its source. Networks are not recorded in the change log.
+        
+        Args:
+            cursor: Cursor of the ingest transaction
+            networks: (first, last, source, score, last_seen) tuples
+            created_at: Creation time (epoch seconds) for new rows
+        
+        Returns:
+            Number of networks that are new or scored higher
+        """
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS staging_networks (
+                first_address BLOB NOT NULL,
+                last_address BLOB NOT NULL,
+                source TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL
+            )
+        """)
+        cursor.executemany("INSERT INTO staging_networks VALUES (?, ?, ?, ?, ?)", networks)
+        
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM (
+                SELECT first_address, last_address, source, MAX(score) AS score
+                FROM staging_networks
+                GROUP BY first_address, last_address, source
+            ) s
+            LEFT JOIN network_sightings n
+                ON n.first_address = s.first_address
+                AND n.last_address = s.last_address
+                AND n.source = s.source
+            WHERE n.score IS NULL OR n.score < s.score
+        """)
+        changed = cursor.fetchone()[0]
+        
+        cursor.execute("""
+            INSERT INTO network_sightings
+            (first_address, last_address, source, score, last_seen, created_at)
+            SELECT first_address, last_address, source, MAX(score), MAX(last_seen), ?
+            FROM staging_networks
+            WHERE true
+            GROUP BY first_address, last_address, source
+            ON CONFLICT(first_address, last_address, source) DO UPDATE SET
+                score = MAX(network_sightings.score, excluded.score),
+                last_seen = MAX(network_sightings.last_seen, excluded.last_seen)
+        """, (created_at,))
+        
+        cursor.execute("DELETE FROM staging_networks")
+        return changed
+
+    @staticmethod
+    def _next_generation(cursor: sqlite3.Cursor) -> int:
+        """
+        Get the number the next committed generation will have.
+        
+        Read from meta inside the write transaction, so concurrent writers
+        never pick the same number even before the previous one is
+        published.
+        
+        Args:
+            cursor: Cursor of the write transaction
+        
+        Returns:
+            Current persisted generation plus one
+        """
+        cursor.execute("SELECT value FROM meta WHERE key = 'generation'")
+        return cursor.fetchone()[0] + 1
+
+    @staticmethod
+    def _commit_generation(cursor: sqlite3.Cursor, generation: int):
+        """
+        Persist a new generation number inside the current write transaction.
+        
+        The in-memory value is only updated by _publish_generation once the
+        transaction has committed.
+        
+        Args:
+            cursor: Cursor of the write transaction
+            generation: New generation number
+        """
+        cursor.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (generation,))
+
+    def _publish_generation(self, generation: int):
+        """
+        Expose a committed generation to get_generation().
+        
+        Readers that see the new number are guaranteed to read the rows
+        written under it; publishing it before COMMIT would let a snapshot
+        of the old rows be cached under the new generation.
+        
+        Args:
+            generation: Generation whose transaction has committed
+        """
+        with self._generation_lock:
+            self._generation = max(self._generation, generation)
+
+    def record_feed(self, source: str, fingerprint: str):
+        """
+        Remember the feed whose entries were just stored for a source.
+        
+        Args:
+            source: Source name
+            fingerprint: Feed content and parse settings, see
+                BaseCollector.feed_fingerprint
+        """
+        try:
+            with self.connections.writer() as conn:
+                conn.execute("""
+                    INSERT INTO feed_state (source, fingerprint) VALUES (?, ?)
+                    ON CONFLICT(source) DO UPDATE SET fingerprint = excluded.fingerprint
+                """, (source, fingerprint))
+        
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to record feed state for {source}: {e}")
+
+    def refresh_source(self, source: str, fingerprint: str, last_seen: Optional[int] = None) -> bool:
+        """
+        Mark the stored entries of an unchanged feed as seen again.
+        
+        The entries are only refreshed when the feed was stored with the
+        same fingerprint and its entries are still in the database (not
+        reset, expired or lost to a failed ingest); otherwise the caller
+        must parse and store the feed again.
+        
+        Args:
+            source: Source name
+            fingerprint: Feed content and parse settings
+            last_seen: Timestamp to set (default: now)
+        
+        Returns:
+            True if the entries were refreshed
+        """
+        last_seen = last_seen or int(time.time())
+        
+        try:
+            with self.connections.writer() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    SELECT f.fingerprint, c.ip_count
+                    FROM feed_state f
+                    LEFT JOIN source_counts c ON c.source = f.source
+                    WHERE f.source = ?
+                """, (source,))
+                row = cursor.fetchone()
+                if row is None or row[0] != fingerprint or not row[1]:
+                    return False
+                
+                cursor.execute("""
+                    UPDATE ip_sightings SET last_seen = ?
+                    WHERE source = ? AND last_seen < ?
+                """, (last_seen, source, last_seen))
+                
+                cursor.execute("""
+                    UPDATE malicious_ips SET last_seen = ?
+                    WHERE last_seen < ?
+                    AND ip_address IN (SELECT ip_address FROM ip_sightings WHERE source = ?)
+                """, (last_seen, last_seen, source))
+                
+                cursor.execute("""
+                    UPDATE network_sightings SET last_seen = ?
+                    WHERE source = ? AND last_seen < ?
+                """, (last_seen, source, last_seen))
+            
+            self.logger.debug(f"Refreshed {row[1]} unchanged IPs from {source}")
+            return True
+        
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to refresh IPs from {source}: {e}")
+            return False
+
+    def get_generation(self) -> int:
+        """
+        Get the current data generation.
+        
+        The generation increases every time a write changes the set of IPs
+        or networks, their scores or their source counts, so an unchanged value means
+        nothing to resync and cached reads are still valid. Writes that only
+        move last_seen keep the generation, since RANK_ORDER does not depend
+        on it.
+        
+        Returns:
+            Current generation number
+        """
+        return self._generation
+
+    def get_changes_since(self, generation: int, min_score: int = 0) -> Dict[str, Any]:
+        """
+        Get the IPs that changed after a given generation.
+        
+        Changed IPs that currently meet min_score are reported as added,
+        the rest (removed or rescored below the threshold) as removed. If
+        the requested generation is older than the retained change log, or
+        newer than the database, a full snapshot is returned instead.
+        Stored networks are not part of the change log; read them with
+        get_ranked_networks().
+        
+        Args:
+            generation: Generation the caller last consumed
+            min_score: Minimum score threshold of the caller's view
+        
+        Returns:
+            Dictionary with 'generation' (current), 'full' (True if 'added'
+            is a complete snapshot to replace the caller's state), 'added'
+            and 'removed' lists of IP addresses
+        """
+        try:
+            conn = self.connections.reader()
+            cursor = conn.cursor()
+            
+            # Read the generation and the log from one snapshot
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute("SELECT key, value FROM meta WHERE key IN ('generation', 'pruned_generation')")
+                meta = dict(cursor.fetchall())
+                current = meta['generation']
+                
+                if generation < meta['pruned_generation'] or generation > current:
+                    cursor.execute(
+                        f"SELECT ip_address FROM malicious_ips WHERE score >= ? ORDER BY {self.RANK_ORDER}",
+                        (min_score,)
+                    )
+                    return {
+                        'generation': current,
+                        'full': True,
+                        'added': [unpack_ip(row[0]) for row in cursor.fetchall()],
+                        'removed': []
+                    }
+                
+                cursor.execute("""
+                    SELECT c.ip_address, m.score >= ?
+                    FROM ip_changes c
+                    LEFT JOIN malicious_ips m ON m.ip_address = c.ip_address
+                    WHERE c.generation > ?
+                """, (min_score, generation))
+                
+                added = []
+                removed = []
+                for ip, present in cursor.fetchall():
+                    (added if present else removed).append(unpack_ip(ip))
+                
+                return {
+                    'generation': current,
+                    'full': False,
+                    'added': added,
+                    'removed': removed
+                }
+            finally:
+                cursor.execute("COMMIT")
+        
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to get changes since generation {generation}: {e}")
+            return {'generation': generation, 'full': False, 'added': [], 'removed': []}
 
     def get_all_ips(self, min_score: int = 0) -> List[str]:
         """
@@ -124,56 +841,380 @@ class IPDatabase:
         
         Args:
             min_score: Minimum score threshold
-            
+        
         Returns:
             List of IP addresses
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.connections.reader().cursor()
             
             cursor.execute(
-                "SELECT ip_address FROM malicious_ips WHERE score >= ? ORDER BY score DESC",
+                f"SELECT ip_address FROM malicious_ips WHERE score >= ? ORDER BY {self.RANK_ORDER}",
                 (min_score,)
             )
             
-            ips = [row[0] for row in cursor.fetchall()]
-            
-            conn.close()
+            ips = [unpack_ip(row[0]) for row in cursor.fetchall()]
             
             self.logger.info(f"Retrieved {len(ips)} IPs from database (min_score={min_score})")
             return ips
-            
+        
         except sqlite3.Error as e:
             self.logger.error(f"Failed to get IPs: {e}")
             return []
 
-    def cleanup_old_ips(self, days: int = 30):
+    def get_ranked_ips(self, min_score: int = 0) -> Optional[List[tuple]]:
         """
-        Remove IPs not seen in the last N days.
+        Get packed IP addresses with their scores, best ranked first.
+        
+        Rows follow RANK_ORDER, so the first N rows are the top-N selection.
         
         Args:
-            days: Number of days threshold
+            min_score: Minimum score threshold
+        
+        Returns:
+            List of (packed ip, score) tuples, see utils.iputils, or None if
+            the read failed (unlike an empty blocklist)
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cutoff_date = datetime.now().timestamp() - (days * 86400)
+            cursor = self.connections.reader().cursor()
             
             cursor.execute(
-                "DELETE FROM malicious_ips WHERE last_seen < datetime(?, 'unixepoch')",
-                (cutoff_date,)
+                f"SELECT ip_address, score FROM malicious_ips WHERE score >= ? ORDER BY {self.RANK_ORDER}",
+                (min_score,)
             )
             
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+            return cursor.fetchall()
+        
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to get ranked IPs: {e}")
+            return None
+
+    def get_ranked_networks(self, min_score: int = 0) -> Optional[List[tuple]]:
+        """
+        Get stored networks with their scores, best ranked first.
+        
+        A network reported by several sources is returned once, with the
+        maximum score, and ranked like addresses (score, number of sources,
+        most recently listed).
+        
+        Args:
+            min_score: Minimum score threshold
+        
+        Returns:
+            List of (packed first, packed last, score) tuples, or None if
+            the read failed
+        """
+        try:
+            cursor = self.connections.reader().cursor()
+            
+            cursor.execute("""
+                SELECT first_address, last_address, MAX(score) AS score
+                FROM network_sightings
+                GROUP BY first_address, last_address
+                HAVING MAX(score) >= ?
+                ORDER BY score DESC, COUNT(*) DESC, MIN(created_at) DESC,
+                         first_address, last_address
+            """, (min_score,))
+            
+            return cursor.fetchall()
+        
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to get ranked networks: {e}")
+            return None
+
+    def get_ips_in_network(self, network: str, min_score: int = 0) -> List[str]:
+        """
+        Get IP addresses contained in a network.
+        
+        Args:
+            network: CIDR string, e.g. '203.0.113.0/24' or '2001:db8::/32'
+            min_score: Minimum score threshold
+        
+        Returns:
+            List of IP addresses in address order
+        
+        Raises:
+            ValueError: If the network string is invalid
+        """
+        first, last = network_bounds(network)
+        
+        try:
+            cursor = self.connections.reader().cursor()
             
-            self.logger.info(f"Cleaned up {deleted_count} old IPs (older than {days} days)")
+            cursor.execute("""
+                SELECT ip_address FROM malicious_ips
+                WHERE ip_address BETWEEN ? AND ? AND score >= ?
+                ORDER BY ip_address
+            """, (first, last, min_score))
             
+            return [unpack_ip(row[0]) for row in cursor.fetchall()]
+        
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to get IPs in {network}: {e}")
+            return []
+
+    def count_ips_in_network(self, network: str, min_score: int = 0) -> int:
+        """
+        Count IP addresses contained in a network.
+        
+        Args:
+            network: CIDR string, e.g. '203.0.113.0/24' or '2001:db8::/32'
+            min_score: Minimum score threshold
+        
+        Returns:
+            Number of stored IPs in the network
+        
+        Raises:
+            ValueError: If the network string is invalid
+        """
+        first, last = network_bounds(network)
+        
+        try:
+            cursor = self.connections.reader().cursor()
+            
+            cursor.execute("""
+                SELECT COUNT(*) FROM malicious_ips
+                WHERE ip_address BETWEEN ? AND ? AND score >= ?
+            """, (first, last, min_score))
+            
+            return cursor.fetchone()[0]
+        
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to count IPs in {network}: {e}")
+            return 0
+
+    def get_prefix_counts(self, prefix_length: int = 24, min_count: int = 1,
+                          min_score: int = 0, version: int = 4) -> Dict[str, int]:
+        """
+        Count stored IPs per network prefix.
+        
+        Args:
+            prefix_length: Prefix length to group by (byte-aligned for IPv6)
+            min_count: Only return prefixes with at least this many IPs
+            min_score: Minimum score threshold
+            version: IP version, 4 or 6
+        
+        Returns:
+            Dictionary mapping CIDR strings to IP counts
+        
+        Raises:
+            ValueError: If the prefix length is invalid for the IP version
+        """
+        if version == 4:
+            if not 0 <= prefix_length <= 32:
+                raise ValueError(f"Invalid IPv4 prefix length: {prefix_length}")
+            shift = 32 - prefix_length
+            query = """
+                SELECT ip_address >> ? AS prefix, COUNT(*) FROM malicious_ips
+                WHERE typeof(ip_address) = 'integer' AND score >= ?
+                GROUP BY prefix HAVING COUNT(*) >= ?
+            """
+            params = (shift, min_score, min_count)
+        elif version == 6:
+            if prefix_length % 8 or not 0 <= prefix_length <= 128:
+                raise ValueError(f"IPv6 prefix length must be a multiple of 8: {prefix_length}")
+            query = """
+                SELECT substr(ip_address, 1, ?) AS prefix, COUNT(*) FROM malicious_ips
+                WHERE typeof(ip_address) = 'blob' AND score >= ?
+                GROUP BY prefix HAVING COUNT(*) >= ?
+            """
+            params = (prefix_length // 8, min_score, min_count)
+        else:
+            raise ValueError(f"Invalid IP version: {version}")
+        
+        try:
+            cursor = self.connections.reader().cursor()
+            cursor.execute(query, params)
+            
+            counts = {}
+            for prefix, count in cursor.fetchall():
+                if version == 4:
+                    address = unpack_ip(prefix << shift)
+                else:
+                    address = unpack_ip(bytes(prefix).ljust(16, b'\0'))
+                counts[f"{address}/{prefix_length}"] = count
+            
+            return counts
+        
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to get prefix counts: {e}")
+            return {}
+
+    def cleanup_old_ips(self, days: int = 30, batch_size: int = 0) -> Dict[str, int]:
+        """
+        Remove IPs and networks not seen in the last N days.
+        
+        Expired IPs are deleted in batches, each in its own short write
+        transaction, so collectors are never locked out for long. Freed
+        pages are then returned to the filesystem with incremental vacuum.
+        
+        Args:
+            days: Number of days threshold
+            batch_size: Rows deleted per transaction (default CLEANUP_BATCH_SIZE)
+        
+        Returns:
+            Dictionary with 'deleted' row count and 'reclaimed_bytes'
+        """
+        batch_size = batch_size or self.CLEANUP_BATCH_SIZE
+        cutoff = int(time.time()) - days * 86400
+        deleted_count = 0
+        
+        try:
+            while True:
+                deleted = self._delete_expired_batch(cutoff, batch_size)
+                deleted_count += deleted
+                if deleted < batch_size:
+                    break
+            
+            deleted_networks = self._delete_expired_networks(cutoff)
+            if deleted_networks:
+                self.logger.info(f"Cleaned up {deleted_networks} old networks (older than {days} days)")
+            
+            reclaimed_bytes = self._incremental_vacuum()
+            
+            self.logger.info(f"Cleaned up {deleted_count} old IPs (older than {days} days), "
+                             f"reclaimed {reclaimed_bytes} bytes")
+        
         except sqlite3.Error as e:
             self.logger.error(f"Failed to cleanup old IPs: {e}")
+            reclaimed_bytes = 0
+        
+        return {'deleted': deleted_count, 'reclaimed_bytes': reclaimed_bytes}
+
+    def _delete_expired_networks(self, cutoff: int) -> int:
+        """
+        Delete the network sightings last seen before the cutoff.
+        
+        Netblock lists are small, so this runs in one transaction.
+        
+        Args:
+            cutoff: Epoch seconds; networks last seen earlier are removed
+        
+        Returns:
+            Number of network sightings deleted
+        """
+        generation = None
+        
+        with self.connections.writer() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("DELETE FROM network_sightings WHERE last_seen < ?", (cutoff,))
+            deleted_count = cursor.rowcount
+            
+            if deleted_count:
+                generation = self._next_generation(cursor)
+                self._commit_generation(cursor, generation)
+        
+        if generation is not None:
+            self._publish_generation(generation)
+        
+        return deleted_count
+
+    def _delete_expired_batch(self, cutoff: int, batch_size: int) -> int:
+        """
+        Delete one batch of IPs last seen before the cutoff.
+        
+        Args:
+            cutoff: Epoch seconds; IPs last seen earlier are removed
+            batch_size: Maximum number of IPs to delete
+        
+        Returns:
+            Number of IPs deleted
+        """
+        generation = None
+        
+        with self.connections.writer() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS expired_ips (
+                    ip_address BLOB PRIMARY KEY
+                ) WITHOUT ROWID
+            """)
+            
+            cursor.execute("""
+                INSERT INTO expired_ips (ip_address)
+                SELECT ip_address FROM malicious_ips
+                WHERE last_seen < ?
+                LIMIT ?
+            """, (cutoff, batch_size))
+            
+            deleted_count = cursor.rowcount
+            
+            if deleted_count:
+                generation = self._next_generation(cursor)
+                
+                cursor.execute("""
+                    INSERT INTO ip_changes (ip_address, generation)
+                    SELECT ip_address, ? FROM expired_ips
+                    WHERE true
+                    ON CONFLICT(ip_address) DO UPDATE SET generation = excluded.generation
+                """, (generation,))
+                
+                cursor.execute("""
+                    DELETE FROM ip_sightings
+                    WHERE ip_address IN (SELECT ip_address FROM expired_ips)
+                """)
+                
+                cursor.execute("""
+                    DELETE FROM malicious_ips
+                    WHERE ip_address IN (SELECT ip_address FROM expired_ips)
+                """)
+                
+                self._commit_generation(cursor, generation)
+            
+            cursor.execute("DELETE FROM expired_ips")
+            self._prune_change_log(cursor)
+        
+        if generation is not None:
+            self._publish_generation(generation)
+        
+        return deleted_count
+
+    def _incremental_vacuum(self) -> int:
+        """
+        Return free pages to the filesystem.
+        
+        Returns:
+            Number of bytes the database file shrank by
+        """
+        with self.connections.exclusive() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+            
+            # execute() steps a column-less pragma only once (one page);
+            # executescript() runs it to completion
+            conn.executescript("PRAGMA incremental_vacuum;")
+            
+            pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+        
+        return (pages_before - pages_after) * page_size
+
+    def _prune_change_log(self, cursor: sqlite3.Cursor):
+        """
+        Drop removal tombstones older than CHANGE_LOG_RETENTION generations.
+        
+        Consumers behind the pruned generation get a full snapshot from
+        get_changes_since().
+        
+        Args:
+            cursor: Cursor of the write transaction
+        """
+        cursor.execute("SELECT value FROM meta WHERE key = 'generation'")
+        horizon = cursor.fetchone()[0] - self.CHANGE_LOG_RETENTION
+        if horizon <= 0:
+            return
+        
+        cursor.execute("""
+            DELETE FROM ip_changes
+            WHERE generation <= ?
+            AND ip_address NOT IN (SELECT ip_address FROM malicious_ips)
+        """, (horizon,))
+        
+        if cursor.rowcount:
+            cursor.execute("""
+                UPDATE meta SET value = MAX(value, ?) WHERE key = 'pruned_generation'
+            """, (horizon,))
 
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -183,29 +1224,27 @@ class IPDatabase:
             Dictionary with stats
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.connections.reader().cursor()
             
-            # Total IPs
-            cursor.execute("SELECT COUNT(*) FROM malicious_ips")
-            total_ips = cursor.fetchone()[0]
+            # Total IPs (trigger-maintained counter)
+            cursor.execute("SELECT value FROM meta WHERE key = 'total_ips'")
+            row = cursor.fetchone()
+            total_ips = row[0] if row else 0
             
-            # IPs by source
+            # IPs by source (one row per source)
             cursor.execute("""
-                SELECT sources, COUNT(*) as count
-                FROM malicious_ips
-                GROUP BY sources
-                ORDER BY count DESC
+                SELECT source, ip_count
+                FROM source_counts
+                WHERE ip_count > 0
+                ORDER BY ip_count DESC
             """)
             sources = {row[0]: row[1] for row in cursor.fetchall()}
             
-            conn.close()
-            
             return {
                 'total_ips': total_ips,
                 'sources': sources
             }
-            
+        
         except sqlite3.Error as e:
             self.logger.error(f"Failed to get stats: {e}")
             return {'total_ips': 0, 'sources': {}}
@@ -2,15 +2,27 @@
 Core engine for dynamic-firewall.
 """
 import logging
+import os
+import threading
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence, Tuple, Union
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
 from .config import Config
 from .database import IPDatabase
+from .cache import SnapshotCache
+from .allowlist import Allowlist
 from ..collectors import get_collector
 from ..syncers import get_syncer
+from ..utils.batch import as_batches
+from ..utils.bogons import filter_bogons
+from ..utils.cidr import aggregate, rank_entries, to_entries
+from ..utils.iputils import PackedIP, PackedRange
 
 
 class Engine:
@@ -37,6 +49,15 @@ class Engine:
         db_path = self.config.get('global.db_path', 'data/ips.db')
         self.db = IPDatabase(db_path)
         
+        # Snapshot cache in front of the database for repeated reads
+        self.cache = SnapshotCache(self.db)
+        
+        # Networks that are never pushed to the firewalls
+        self.allowlist = Allowlist(
+            self.config.get('allowlist', {}),
+            cache_dir=self.config.get('global.cache_dir', 'data/cache')
+        )
+        
         # Initialize collectors
         self.collectors = []
         self._init_collectors()
@@ -45,8 +66,36 @@ class Engine:
         self.syncers = []
         self._init_syncers()
         
-        # Initialize scheduler
-        self.scheduler = BackgroundScheduler()
+        # Database generation last pushed to every syncer
+        self.synced_generation = None
+        
+        # Serializes firewall pushes and coalesced sync requests
+        self._sync_lock = threading.Lock()
+        self._sync_request_lock = threading.Lock()
+        
+        # Per-collector scheduling state: consecutive failures, current job
+        # interval and the future of the last run
+        self._collector_failures = {}
+        self._collector_intervals = {}
+        self._collector_futures = {}
+        self._collector_pool = None
+        
+        # Syncers push concurrently on a bounded pool; a syncer still running
+        # from an abandoned cycle is skipped until it returns
+        max_workers = self.config.get('global.syncer_workers', 4)
+        self._syncer_pool = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(self.syncers) or 1)),
+            thread_name_prefix='syncer'
+        )
+        self._syncer_futures = {}
+        
+        # Outcome of the last sync cycle per syncer: (status, seconds)
+        self.sync_results: Dict[str, Tuple[str, float]] = {}
+        
+        # Initialize scheduler; every collector job waits on its own run
+        self.scheduler = BackgroundScheduler(executors={
+            'default': {'type': 'threadpool', 'max_workers': len(self.collectors) + 4}
+        })
         
         self.logger.info("Engine initialized successfully")
 
@@ -64,10 +113,14 @@ class Engine:
         """Initialize all enabled collectors."""
         collectors_config = self.config.get_collectors_config()
         
+        cache_dir = self.config.get('global.cache_dir', 'data/cache')
+        
         for name, config in collectors_config.items():
             if config.get('enabled', False):
                 try:
+                    config = {'cache_dir': cache_dir, **config}
                     collector = get_collector(name, config)
+                    collector.refresh_source = self.db.refresh_source
                     self.collectors.append(collector)
                     self.logger.info(f"Initialized collector: {name}")
                 except Exception as e:
@@ -77,9 +130,13 @@ class Engine:
         """Initialize all enabled syncers."""
         syncers_config = self.config.get_syncers_config()
         
+        # Syncers keep their state (e.g. resolved group IDs) next to the database
+        state_dir = os.path.dirname(self.config.get('global.db_path', 'data/ips.db')) or '.'
+        
         for name, config in syncers_config.items():
             if config.get('enabled', False):
                 try:
+                    config = {'state_dir': state_dir, **config}
                     syncer = get_syncer(name, config)
                     self.syncers.append(syncer)
                     self.logger.info(f"Initialized syncer: {name}")
@@ -87,61 +144,456 @@ class Engine:
                     self.logger.error(f"Failed to initialize syncer {name}: {e}")
 
     def collect_ips(self):
-        """Collect IPs from all enabled collectors."""
+        """
+        Collect IPs from all enabled collectors.
+        
+        Collectors run concurrently on a bounded thread pool and stream
+        their batches into the database as they are parsed, so the cycle
+        takes as long as the slowest collector rather than the sum.
+        Collectors that exceed their timeout are abandoned for this cycle.
+        """
         self.logger.info("=" * 60)
         self.logger.info("Starting IP collection cycle...")
         
-        all_ips = []
+        if not self.collectors:
+            self.logger.warning("No collectors enabled")
+            return
         
+        max_workers = self.config.get('global.collector_workers', 4)
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(self.collectors))),
+            thread_name_prefix='collector'
+        )
+        
+        started = time.monotonic()
+        deadlines = {}
         for collector in self.collectors:
-            try:
-                ips = collector.fetch()
-                all_ips.extend(ips)
-                self.logger.info(f"Collected {len(ips)} IPs from {collector.name}")
-            except Exception as e:
-                self.logger.error(f"Error collecting from {collector.name}: {e}")
-        
-        # Add IPs to database
-        if all_ips:
-            self.db.add_ips(all_ips)
-            self.logger.info(f"Total IPs collected: {len(all_ips)}")
+            future = executor.submit(self._run_collector, collector)
+            deadlines[future] = (collector, started + collector.timeout)
+        
+        total = 0
+        pending = set(deadlines)
+        
+        try:
+            while pending:
+                next_deadline = min(deadlines[future][1] for future in pending)
+                done, pending = wait(
+                    pending,
+                    timeout=max(0, next_deadline - time.monotonic()),
+                    return_when=FIRST_COMPLETED
+                )
+                
+                for future in done:
+                    collector = deadlines[future][0]
+                    try:
+                        count = future.result()
+                        total += count
+                        self.logger.info(f"Collected {count} IPs from {collector.name}")
+                    except Exception as e:
+                        self.logger.error(f"Error collecting from {collector.name}: {e}")
+                
+                now = time.monotonic()
+                for future in [f for f in pending if deadlines[f][1] <= now]:
+                    collector = deadlines[future][0]
+                    future.cancel()
+                    pending.discard(future)
+                    self.logger.error(f"Collector {collector.name} timed out "
+                                      f"after {collector.timeout}s, skipping this cycle")
+        finally:
+            # Do not block on abandoned collectors; their threads finish on their own
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        if total:
+            self.logger.info(f"Total IPs collected: {total} "
+                             f"in {time.monotonic() - started:.1f}s")
         else:
             self.logger.warning("No IPs collected in this cycle")
         
         # Show stats
-        stats = self.db.get_stats()
+        stats = self.cache.get_stats()
         self.logger.info(f"Database stats: {stats['total_ips']} total IPs")
 
+    def _run_collector(self, collector) -> int:
+        """
+        Fetch from one collector and store each batch as it arrives.
+        
+        Reserved and bogon addresses are dropped before they reach the
+        database.
+        
+        Args:
+            collector: Collector to run
+            
+        Returns:
+            Number of IPs collected
+        """
+        count = 0
+        rejected = 0
+        stored = True
+        collector.parsed_feeds = {}
+        for records in collector.fetch_batches():
+            for batch in as_batches(records):
+                batch, dropped = filter_bogons(batch)
+                rejected += dropped
+                if len(batch) and not self.db.add_ips(batch):
+                    stored = False
+                count += len(batch)
+        
+        # Unchanged feeds are only skipped later if their entries made it
+        # into the database
+        if stored:
+            for source, fingerprint in collector.parsed_feeds.items():
+                self.db.record_feed(source, fingerprint)
+        
+        if rejected:
+            self.logger.info(f"Dropped {rejected} reserved/bogon IPs from {collector.name}")
+        return count
+
+    def collect_from(self, collector):
+        """
+        Scheduled job: run one collector and reschedule it.
+        
+        The collector runs on the bounded collector pool and is abandoned
+        after its timeout. Consecutive failures back off exponentially from
+        the collector's interval up to its max_backoff. A firewall push is
+        requested when the database changed.
+        
+        Args:
+            collector: Collector to run
+        """
+        previous = self._collector_futures.get(collector.name)
+        if previous is not None and not previous.done():
+            self.logger.warning(f"Collector {collector.name} is still running "
+                                f"from a previous run, skipping")
+            return
+        
+        collector.errors = 0
+        future = self._collector_pool.submit(self._run_collector, collector)
+        self._collector_futures[collector.name] = future
+        
+        failed = True
+        try:
+            count = future.result(timeout=collector.timeout)
+            # Errors with nothing collected means the source is failing
+            failed = bool(collector.errors) and not count
+            if failed:
+                self.logger.error(f"Collector {collector.name} failed")
+            else:
+                self.logger.info(f"Collected {count} IPs from {collector.name}")
+        except FutureTimeoutError:
+            self.logger.error(f"Collector {collector.name} timed out after {collector.timeout}s")
+        except Exception as e:
+            self.logger.error(f"Error collecting from {collector.name}: {e}")
+        
+        self._reschedule_collector(collector, failed)
+        
+        if self.db.get_generation() != self.synced_generation:
+            self.request_sync()
+
+    def _collector_interval(self, collector) -> int:
+        """
+        Get the regular run interval of a collector.
+        
+        Args:
+            collector: Collector
+            
+        Returns:
+            Interval in seconds (global update_interval if not set)
+        """
+        return collector.interval or self.config.get('global.update_interval', 3600)
+
+    def _reschedule_collector(self, collector, failed: bool):
+        """
+        Adjust a collector's job interval after a run.
+        
+        Args:
+            collector: Collector that ran
+            failed: Whether the run failed
+        """
+        interval = self._collector_interval(collector)
+        failures = self._collector_failures.get(collector.name, 0) + 1 if failed else 0
+        self._collector_failures[collector.name] = failures
+        
+        delay = interval
+        if failures:
+            delay = min(interval * 2 ** failures, max(interval, collector.max_backoff))
+            self.logger.warning(f"Collector {collector.name} failed {failures} time(s) in a row, "
+                                f"next attempt in {delay}s")
+        
+        job_id = f'collect_{collector.name}'
+        if delay != self._collector_intervals.get(collector.name) and self.scheduler.get_job(job_id):
+            self._collector_intervals[collector.name] = delay
+            self.scheduler.reschedule_job(
+                job_id,
+                trigger=IntervalTrigger(seconds=delay, jitter=collector.jitter or None)
+            )
+
+    def request_sync(self):
+        """
+        Schedule a firewall push in global.sync_delay seconds.
+        
+        Requests made while a push is already pending join it, so several
+        collectors finishing close together cause a single push.
+        """
+        delay = self.config.get('global.sync_delay', 30)
+        
+        with self._sync_request_lock:
+            if self.scheduler.get_job('coalesced_sync') is not None:
+                return
+            
+            self.scheduler.add_job(
+                self.sync_firewalls,
+                trigger=DateTrigger(run_date=datetime.now() + timedelta(seconds=delay)),
+                id='coalesced_sync',
+                name='Sync to firewalls (coalesced)',
+                misfire_grace_time=None
+            )
+            self.logger.debug(f"Firewall sync scheduled in {delay}s")
+
     def sync_firewalls(self):
         """Sync IPs to all enabled syncers."""
+        with self._sync_lock:
+            self._sync_firewalls()
+
+    def _sync_firewalls(self):
+        """Sync IPs to all enabled syncers, with the sync lock held."""
         self.logger.info("=" * 60)
         self.logger.info("Starting firewall sync cycle...")
         
+        # Skip the push entirely if nothing changed since the last one
+        generation = self.db.get_generation()
+        if generation == self.synced_generation:
+            self.logger.info(f"No changes since last sync (generation {generation}), skipping")
+            return
+        
         # Get all IPs from database
         min_score = self.config.get('global.min_score', 3)
-        ips = self.db.get_all_ips(min_score=min_score)
+        snapshot = self.cache.get_snapshot(min_score=min_score)
         
-        if not ips:
-            self.logger.warning("No IPs to sync")
+        # A failed read must not be pushed as an empty blocklist
+        if snapshot.generation is None:
+            self.logger.error("Failed to read the blocklist, retrying on the next cycle")
             return
         
-        self.logger.info(f"Syncing {len(ips)} IPs to firewalls...")
+        # An empty blocklist (e.g. everything expired) is pushed like any
+        # other, so the gateways drop the entries they still hold
+        if not len(snapshot) and not snapshot.networks:
+            self.logger.warning("Blocklist is empty, clearing firewall entries")
+        
+        ranked, _ = self.allowlist.filter(list(snapshot.iter_entries()))
+        
+        self.logger.info(f"Syncing {len(ranked)} IPs and networks to firewalls "
+                         f"(generation {generation})...")
+        
+        # Entries are built once per budget, before any push starts, and
+        # shared read-only by every syncer with that budget
+        entries_by_budget = {}
+        for syncer in self.syncers:
+            budget = syncer.max_entries or 0
+            if budget not in entries_by_budget:
+                entries_by_budget[budget] = tuple(self._select_entries(ranked, budget))
+        
+        self.sync_results = self._run_syncers(entries_by_budget)
+        
+        # Failed targets are retried on the next cycle
+        if all(status == 'ok' for status, _ in self.sync_results.values()):
+            self.synced_generation = generation
+
+    def _run_syncers(self, entries_by_budget: Dict[int, Sequence[str]]) -> Dict[str, Tuple[str, float]]:
+        """
+        Push the entries to all syncers concurrently.
+        
+        Every syncer runs on the bounded syncer pool and is abandoned after
+        its timeout, so a slow gateway does not delay the others.
+        
+        Args:
+            entries_by_budget: Entries to push per max_entries budget
+            
+        Returns:
+            (status, seconds) per syncer name; status is 'ok', 'failed',
+            'error', 'timeout' or 'skipped'
+        """
+        started = time.monotonic()
+        results = {}
+        deadlines = {}
         
-        # Sync to all enabled syncers
         for syncer in self.syncers:
-            try:
-                success = syncer.sync(ips)
-                if success:
-                    self.logger.info(f"Successfully synced to {syncer.name}")
-                else:
-                    self.logger.error(f"Failed to sync to {syncer.name}")
-            except Exception as e:
-                self.logger.error(f"Error syncing to {syncer.name}: {e}")
+            previous = self._syncer_futures.get(syncer.name)
+            if previous is not None and not previous.done():
+                self.logger.warning(f"Syncer {syncer.name} is still running "
+                                    f"from a previous cycle, skipping")
+                results[syncer.name] = ('skipped', 0.0)
+                continue
+            
+            entries = entries_by_budget[syncer.max_entries or 0]
+            future = self._syncer_pool.submit(self._run_syncer, syncer, entries)
+            self._syncer_futures[syncer.name] = future
+            deadlines[future] = (syncer, started + syncer.timeout)
+        
+        pending = set(deadlines)
+        while pending:
+            next_deadline = min(deadlines[future][1] for future in pending)
+            done, pending = wait(
+                pending,
+                timeout=max(0, next_deadline - time.monotonic()),
+                return_when=FIRST_COMPLETED
+            )
+            
+            for future in done:
+                syncer = deadlines[future][0]
+                try:
+                    success, duration = future.result()
+                    if success:
+                        results[syncer.name] = ('ok', duration)
+                        self.logger.info(f"Successfully synced to {syncer.name}")
+                    else:
+                        results[syncer.name] = ('failed', duration)
+                        self.logger.error(f"Failed to sync to {syncer.name}")
+                except Exception as e:
+                    results[syncer.name] = ('error', time.monotonic() - started)
+                    self.logger.error(f"Error syncing to {syncer.name}: {e}")
+            
+            now = time.monotonic()
+            for future in [f for f in pending if deadlines[f][1] <= now]:
+                syncer = deadlines[future][0]
+                future.cancel()
+                pending.discard(future)
+                results[syncer.name] = ('timeout', float(syncer.timeout))
+                self.logger.error(f"Syncer {syncer.name} timed out after {syncer.timeout}s, "
+                                  f"retrying next cycle")
+        
+        # Report in configuration order
+        results = {syncer.name: results[syncer.name] for syncer in self.syncers}
+        summary = ', '.join(f"{name} {status} ({duration:.1f}s)"
+                            for name, (status, duration) in results.items())
+        self.logger.info(f"Sync cycle finished in {time.monotonic() - started:.1f}s: {summary}")
+        return results
+
+    @staticmethod
+    def _run_syncer(syncer, entries: Sequence[str]) -> Tuple[bool, float]:
+        """
+        Push entries to one syncer and time it.
+        
+        Args:
+            syncer: Syncer to run
+            entries: Entries to push
+            
+        Returns:
+            Tuple of (success, seconds taken)
+        """
+        started = time.monotonic()
+        success = syncer.sync(entries)
+        return success, time.monotonic() - started
+
+    def _select_entries(self, ranked: List[Union[PackedIP, PackedRange]], budget: int) -> List[str]:
+        """
+        Build a syncer's firewall entries within its entry budget.
+        
+        The snapshot is already in IPDatabase.RANK_ORDER (score, number of
+        sources, creation time, address), so the selection is a ranked
+        prefix whose aggregated entries fit the budget, and it is stable
+        between cycles. Aggregation never produces more entries than
+        addresses, so a prefix of `budget` addresses fits unless networks
+        split into several CIDRs; the search starts there, gallops to
+        longer prefixes, then narrows down with a binary search.
+        
+        The search is a best-effort heuristic: it assumes the entry count
+        grows with the prefix length, which merges and collapse_threshold
+        can break (a longer prefix may aggregate to fewer entries), so a
+        longer fitting prefix than the one found may exist.
+        
+        The entries are returned best ranked first (see rank_entries), so
+        a syncer that has to cut the list further keeps the best of it.
+        
+        Args:
+            ranked: Packed addresses and network ranges, best ranked first
+            budget: Maximum number of entries (0 = unlimited)
+            
+        Returns:
+            Addresses and CIDR strings of the best ranked IPs, best first
+        """
+        entries = self._aggregate(ranked)
+        if not budget or len(entries) <= budget:
+            return rank_entries(entries, ranked)
+        
+        # Aggregated entries of the longest prefix known to fit; the whole
+        # list does not, so galloping ends at the latest with len(ranked)
+        fits, fit_entries = 0, []
+        too_long = None
+        size = min(budget, len(ranked))
+        while too_long is None:
+            candidate = self._aggregate(ranked[:size], log=False)
+            if len(candidate) <= budget:
+                fits, fit_entries = size, candidate
+                size = min(size * 2, len(ranked))
+            else:
+                too_long = size
+        
+        while too_long - fits > 1:
+            size = (fits + too_long) // 2
+            candidate = self._aggregate(ranked[:size], log=False)
+            if len(candidate) <= budget:
+                fits, fit_entries = size, candidate
+            else:
+                too_long = size
+        
+        self.logger.warning(f"Blocklist has {len(ranked)} IPs in {len(entries)} entries, "
+                            f"keeping the top {fits} IPs in {len(fit_entries)} entries "
+                            f"({len(ranked) - fits} lower ranked IPs left out; best effort, "
+                            f"a longer prefix may fit when networks merge)")
+        return rank_entries(fit_entries, ranked[:fits])
+
+    def _aggregate(self, ips: Sequence[Union[PackedIP, PackedRange]], log: bool = True) -> List[str]:
+        """
+        Turn blocked addresses into firewall entries.
+        
+        With global.aggregation.enabled, adjacent addresses are merged into
+        minimal CIDRs and, if collapse_threshold (or collapse_count_v6 for
+        IPv6) is set, any network of the collapse prefix length that is
+        malicious enough is blocked as a whole, unless it overlaps the
+        allowlist.
+        
+        Args:
+            ips: Packed addresses and network ranges
+            log: Log the aggregation result
+            
+        Returns:
+            Addresses and CIDR strings
+        """
+        if not self.config.get('global.aggregation.enabled', True):
+            return to_entries(ips)
+        
+        started = time.monotonic()
+        entries = aggregate(
+            ips,
+            collapse_threshold=self.config.get('global.aggregation.collapse_threshold', 0),
+            collapse_prefix_v4=self.config.get('global.aggregation.collapse_prefix_v4', 24),
+            collapse_prefix_v6=self.config.get('global.aggregation.collapse_prefix_v6', 64),
+            collapse_count_v6=self.config.get('global.aggregation.collapse_count_v6', 0),
+            exclude=self.allowlist.get_ranges() if self.allowlist.is_configured() else None
+        )
+        if log:
+            self.logger.info(f"Aggregated {len(ips)} IPs into {len(entries)} entries "
+                             f"in {time.monotonic() - started:.2f}s")
+        return entries
+
+    def cleanup_ips(self):
+        """Expire IPs that have not been seen within the retention period."""
+        retention_days = self.config.get('global.retention_days', 30)
+        if not retention_days or retention_days <= 0:
+            return
+        
+        batch_size = self.config.get('global.cleanup_batch_size', IPDatabase.CLEANUP_BATCH_SIZE)
+        
+        self.logger.info(f"Expiring IPs not seen in {retention_days} days...")
+        result = self.db.cleanup_old_ips(days=retention_days, batch_size=batch_size)
+        self.logger.info(f"Retention: removed {result['deleted']} IPs, "
+                         f"reclaimed {result['reclaimed_bytes']} bytes")
 
     def run_once(self):
         """Run collection and sync once."""
         self.logger.info("Running one-time collection and sync...")
         self.collect_ips()
+        self.cleanup_ips()
         self.sync_firewalls()
         self.logger.info("One-time run completed")
 
@@ -155,14 +607,31 @@ class Engine:
         # Schedule periodic tasks
         update_interval = self.config.get('global.update_interval', 3600)
         
-        self.scheduler.add_job(
-            self.collect_ips,
-            trigger=IntervalTrigger(seconds=update_interval),
-            id='collect_ips',
-            name='Collect malicious IPs',
-            replace_existing=True
+        max_workers = self.config.get('global.collector_workers', 4)
+        self._collector_pool = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(self.collectors) or 1)),
+            thread_name_prefix='collector'
         )
         
+        # Every collector is its own job with its own interval and jitter
+        for collector in self.collectors:
+            interval = self._collector_interval(collector)
+            self._collector_intervals[collector.name] = interval
+            
+            self.scheduler.add_job(
+                self.collect_from,
+                trigger=IntervalTrigger(seconds=interval, jitter=collector.jitter or None),
+                args=[collector],
+                id=f'collect_{collector.name}',
+                name=f'Collect from {collector.name}',
+                replace_existing=True,
+                coalesce=True,
+                max_instances=1
+            )
+            self.logger.info(f"Scheduled collector {collector.name} every {interval}s"
+                             + (f" (jitter {collector.jitter}s)" if collector.jitter else ""))
+        
+        # Periodic push as a fallback; collectors also request coalesced pushes
         self.scheduler.add_job(
             self.sync_firewalls,
             trigger=IntervalTrigger(seconds=update_interval),
@@ -171,10 +640,20 @@ class Engine:
             replace_existing=True
         )
         
+        cleanup_interval = self.config.get('global.cleanup_interval', 86400)
+        
+        self.scheduler.add_job(
+            self.cleanup_ips,
+            trigger=IntervalTrigger(seconds=cleanup_interval),
+            id='cleanup_ips',
+            name='Expire stale IPs',
+            replace_existing=True
+        )
+        
         # Start scheduler
         self.scheduler.start()
         
-        self.logger.info(f"Scheduler started (interval: {update_interval}s)")
+        self.logger.info(f"Scheduler started (sync interval: {update_interval}s)")
         self.logger.info("Engine is running. Press Ctrl+C to stop.")
         
         try:
@@ -184,6 +663,8 @@ class Engine:
         except (KeyboardInterrupt, SystemExit):
             self.logger.info("Shutting down...")
             self.scheduler.shutdown()
+            self._shutdown_pools()
+            self.db.close()
             self.logger.info("Engine stopped")
 
     def stop(self):
@@ -191,4 +672,13 @@ class Engine:
         self.logger.info("Stopping engine...")
         if self.scheduler.running:
             self.scheduler.shutdown()
+        self._shutdown_pools()
+        self.db.close()
         self.logger.info("Engine stopped")
+
+    def _shutdown_pools(self):
+        """Stop the collector and syncer pools without waiting for running jobs."""
+        if self._collector_pool is not None:
+            self._collector_pool.shutdown(wait=False, cancel_futures=True)
+            self._collector_pool = None
+        self._syncer_pool.shutdown(wait=False, cancel_futures=True)
@@ -2,7 +2,7 @@
 Base syncer class for all router syncers.
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import Dict, Any, Sequence
 import logging
 
 
@@ -12,6 +12,9 @@ class BaseSyncer(ABC):
     Each syncer must implement the sync() method.
     """
 
+    # Seconds a sync may take before the engine stops waiting for it
+    DEFAULT_TIMEOUT = 300
+
     def __init__(self, config: Dict[str, Any]):
         """
         Initialize the syncer with configuration.
@@ -21,6 +24,11 @@ class BaseSyncer(ABC):
         """
         self.config = config
         self.enabled = config.get('enabled', False)
+        
+        # Maximum number of entries this target accepts (0 = unlimited);
+        # the best ranked IPs are kept when the blocklist is larger
+        self.max_entries = config.get('max_entries', 0)
+        self.timeout = config.get('timeout', self.DEFAULT_TIMEOUT)
         self.logger = logging.getLogger(f"syncer.{self.name}")
 
     @property
@@ -30,12 +38,13 @@ class BaseSyncer(ABC):
         pass
 
     @abstractmethod
-    def sync(self, ips: List[str]) -> bool:
+    def sync(self, ips: Sequence[str]) -> bool:
         """
         Sync malicious IPs to the router firewall.
         
         Args:
-            ips: List of IP addresses to block
+            ips: IP addresses and networks to block, best ranked first;
+                shared with other syncers and must not be modified
             
         Returns:
             True if sync was successful, False otherwise
@@ -50,6 +59,10 @@ class BaseSyncer(ABC):
         """Log info message."""
         self.logger.info(f"[{self.name}] {message}")
 
+    def log_warning(self, message: str):
+        """Log warning message."""
+        self.logger.warning(f"[{self.name}] {message}")
+
     def log_error(self, message: str):
         """Log error message."""
         self.logger.error(f"[{self.name}] {message}")
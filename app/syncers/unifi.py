@@ -1,76 +1,415 @@
 """
 UniFi syncer - syncs IPs to UniFi Gateway firewall.
 """
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
 import requests
 import urllib3
-from typing import List, Dict, Any
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, FrozenSet, Optional, Sequence, Tuple
+from requests.adapters import HTTPAdapter
 from .base import BaseSyncer
+from ..utils.ratelimit import TokenBucket
 
 
 # Disable SSL warnings for self-signed certificates
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Desired state of one group, computed once and pushed to every site:
+# (group name, group type, sorted members, digest, member set)
+GroupPlan = Tuple[str, str, List[str], str, FrozenSet[str]]
+
+
+class ControllerSession(requests.Session):
+    """
+    Pooled session that takes a token from its controller's rate limiter
+    before every request.
+    """
+
+    def __init__(self, limiter: TokenBucket):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, *args, **kwargs):
+        self.limiter.acquire()
+        return super().request(*args, **kwargs)
+
 
 class UniFiSyncer(BaseSyncer):
     """
     Syncer for UniFi Gateway.
     Uses UniFi Network API to manage firewall groups.
     
+    With `sites`, one syncer serves many sites and controllers: the group
+    plan is computed once and pushed to all sites concurrently. Requests
+    are rate limited per controller and sites on the same controller share
+    one connection pool.
+    
     API Documentation: https://developer.ui.com/
     """
 
+    # Firewall group type per address family
+    GROUP_TYPES = {4: 'ipv4-address-group', 6: 'ipv6-address-group'}
+
+    # PUT responses meaning the cached group ID no longer exists
+    STALE_STATUSES = (404, 410)
+
+    # Sites of all syncers share the group ID file
+    _group_ids_file_lock = threading.Lock()
+
     @property
     def name(self) -> str:
         return "unifi"
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], session: Optional[requests.Session] = None):
+        """
+        Initialize the syncer.
+        
+        Args:
+            config: Configuration dictionary for this syncer
+            session: Session to share with other sites of the same
+                controller, created from the config if omitted
+        """
         super().__init__(config)
         self.api_url = config.get('api_url', '').rstrip('/')
         self.api_token = config.get('api_token')
         self.site_id = config.get('site_id')
         self.group_name = config.get('group_name', 'd-firewall-blacklist')
+        self.ipv6 = config.get('ipv6', True)
+        self.group_name_v6 = config.get('group_name_v6', f"{self.group_name}-v6")
         self.verify_ssl = config.get('verify_ssl', False)
         
-        self.session = requests.Session()
-        self.session.verify = self.verify_ssl
+        # Name used in log messages of a site, defaults to its site_id
+        self.label = config.get('label') or self.site_id or self.api_url
+        self.is_site = False
+        
+        # Compare against the group's current members on the gateway instead
+        # of only the last pushed set (one extra GET per group)
+        self.read_back = config.get('read_back', False)
+        
+        # Last pushed member set per group: (content hash, members); only the
+        # hash is known for groups pushed before a restart
+        self._pushed: Dict[str, Tuple[str, Optional[FrozenSet[str]]]] = {}
+        
+        # Changes made by the last sync, see _sync_group
+        self.last_changes = {'added': 0, 'removed': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        self._changes_lock = threading.Lock()
+        
+        # Sharding: entries are spread over <group_name>-0..N-1 by a stable
+        # hash. N is fixed by `shards` because firewall rules must reference
+        # every group; a group over shard_size members keeps its best ranked
+        # entries (0 = no size limit)
+        self.shards = max(1, config.get('shards', 1))
+        self.shard_size = config.get('shard_size', 0)
+        
+        # Surplus groups whose deletion failed (still referenced by a rule);
+        # not retried until restart
+        self._undeletable: set = set()
+        
+        # Changed groups are uploaded in parallel over one pooled session
+        self.workers = max(1, config.get('workers', 4))
+        
+        # Resolved group IDs by name, persisted next to the database with the
+        # last pushed content hash so a sync after a restart does not need to
+        # list the site's groups first or upload unchanged ones
+        state_dir = config.get('state_dir', 'data')
+        self.group_ids_path = os.path.join(state_dir, 'unifi_groups.json')
+        self._group_ids: Dict[str, str] = {}
+        self._groups: Optional[List[Dict[str, Any]]] = None
+        self._groups_lock = threading.Lock()
+        
+        # Requests per second per controller (0 = unlimited) and burst size
+        self.rate_limit = config.get('rate_limit', 0)
+        self.rate_burst = config.get('rate_burst', 10)
+        
+        # Sites pushed at the same time
+        self.site_workers = max(1, config.get('site_workers', 8))
+        
+        sites = config.get('sites')
+        if sites:
+            self.sites = self._init_sites(config, sites)
+            self.session = None
+        else:
+            self.sites = [self]
+            self._load_group_ids()
+            self.session = session or self._new_session(
+                TokenBucket(self.rate_limit, self.rate_burst), self.api_token,
+                self.verify_ssl, self.workers
+            )
+
+    def _init_sites(self, config: Dict[str, Any],
+                    sites: List[Dict[str, Any]]) -> List['UniFiSyncer']:
+        """
+        Create one syncer per site, each site's settings over the shared ones.
+        
+        Sites on the same controller share a rate limiter, and a pooled
+        session when they also use the same API token.
+        
+        Args:
+            config: Syncer configuration
+            sites: Site configurations (site_id, optionally api_url,
+                api_token, label, ...)
+            
+        Returns:
+            Syncers per site
+        """
+        shared = {key: value for key, value in config.items() if key != 'sites'}
+        site_configs = [{**shared, **site} for site in sites]
+        
+        per_host = Counter(site.get('api_url', '').rstrip('/') for site in site_configs)
+        limiters: Dict[str, TokenBucket] = {}
+        sessions: Dict[Tuple[str, Any, Any], requests.Session] = {}
+        
+        result = []
+        for site in site_configs:
+            api_url = site.get('api_url', '').rstrip('/')
+            if api_url not in limiters:
+                limiters[api_url] = TokenBucket(site.get('rate_limit', 0), site.get('rate_burst', 10))
+            
+            key = (api_url, site.get('api_token'), site.get('verify_ssl', False))
+            if key not in sessions:
+                pool_size = max(1, site.get('workers', 4)) * min(per_host[api_url], self.site_workers)
+                sessions[key] = self._new_session(limiters[api_url], key[1], key[2], pool_size)
+            
+            child = UniFiSyncer(site, session=sessions[key])
+            child.is_site = True
+            result.append(child)
+        return result
+
+    @staticmethod
+    def _new_session(limiter: TokenBucket, api_token: Optional[str], verify_ssl: bool,
+                     pool_size: int) -> requests.Session:
+        """
+        Create a pooled, rate limited API session.
+        
+        Args:
+            limiter: Rate limiter of the controller
+            api_token: API key sent with every request
+            verify_ssl: Verify the controller's certificate
+            pool_size: Connections kept open to the controller
+            
+        Returns:
+            Session
+        """
+        session = ControllerSession(limiter)
+        session.verify = verify_ssl
+        session.mount('https://', HTTPAdapter(pool_maxsize=pool_size))
+        session.mount('http://', HTTPAdapter(pool_maxsize=pool_size))
         
         # Set API token in headers
-        if self.api_token:
-            self.session.headers.update({
-                'X-API-KEY': self.api_token,
+        if api_token:
+            session.headers.update({
+                'X-API-KEY': api_token,
                 'Accept': 'application/json',
                 'Content-Type': 'application/json'
             })
+        return session
+
+    def log_info(self, message: str):
+        """Log info message, prefixed with the site when there are several."""
+        super().log_info(self._site_prefix(message))
+
+    def log_warning(self, message: str):
+        """Log warning message, prefixed with the site when there are several."""
+        super().log_warning(self._site_prefix(message))
+
+    def log_error(self, message: str):
+        """Log error message, prefixed with the site when there are several."""
+        super().log_error(self._site_prefix(message))
 
-    def _get_firewall_group(self) -> Dict[str, Any]:
+    def log_debug(self, message: str):
+        """Log debug message, prefixed with the site when there are several."""
+        super().log_debug(self._site_prefix(message))
+
+    def _site_prefix(self, message: str) -> str:
+        """Prefix a message with the site label of a multi-site child."""
+        return f"[{self.label}] {message}" if self.is_site else message
+
+    def _list_firewall_groups(self) -> Optional[List[Dict[str, Any]]]:
         """
-        Get existing firewall group or create new one.
+        List all firewall groups of the site.
         
         Returns:
-            Firewall group data
+            Firewall groups, or None if the request failed
         """
         try:
-            # List all firewall groups
             list_url = f"{self.api_url}/v1/sites/{self.site_id}/firewall/groups"
             response = self.session.get(list_url, timeout=30)
             response.raise_for_status()
             
             data = response.json()
-            groups = data.get('data', [])
+            return data.get('data', [])
             
+        except requests.RequestException as e:
+            self.log_error(f"Failed to list firewall groups: {e}")
+            if hasattr(e.response, 'text'):
+                self.log_debug(f"Response: {e.response.text}")
+            return None
+
+    @property
+    def _cache_key(self) -> str:
+        """Key of this controller and site in the group ID file."""
+        return f"{self.api_url}|{self.site_id}"
+
+    def _load_group_ids(self):
+        """
+        Load the persisted group IDs and pushed content hashes of this site.
+        
+        Entries are {"id": ..., "digest": ...}; plain ID strings of older
+        files are accepted without a hash.
+        """
+        try:
+            with open(self.group_ids_path, 'r', encoding='utf-8') as f:
+                entries = dict(json.load(f).get(self._cache_key, {}))
+        except (OSError, ValueError, TypeError, AttributeError):
+            return
+        
+        for group_name, entry in entries.items():
+            if isinstance(entry, str):
+                self._group_ids[group_name] = entry
+            elif isinstance(entry, dict) and entry.get('id'):
+                self._group_ids[group_name] = entry['id']
+                if entry.get('digest'):
+                    self._pushed[group_name] = (entry['digest'], None)
+
+    def _group_state(self) -> Dict[str, Dict[str, str]]:
+        """
+        Build the persisted entries of this site.
+        
+        Returns:
+            ID and last pushed content hash (if any) per group name
+        """
+        state = {}
+        for group_name, group_id in sorted(self._group_ids.items()):
+            state[group_name] = {'id': group_id}
+            pushed = self._pushed.get(group_name)
+            if pushed is not None:
+                state[group_name]['digest'] = pushed[0]
+        return state
+
+    def _save_group_ids(self):
+        """Persist the group IDs and hashes of this site, keeping other sites' entries."""
+        with self._group_ids_file_lock, self._groups_lock:
+            try:
+                with open(self.group_ids_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            if not isinstance(data, dict):
+                data = {}
+            data[self._cache_key] = self._group_state()
+            
+            try:
+                os.makedirs(os.path.dirname(self.group_ids_path) or '.', exist_ok=True)
+                tmp_path = f"{self.group_ids_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2)
+                os.replace(tmp_path, self.group_ids_path)
+            except OSError as e:
+                self.log_error(f"Failed to save firewall group IDs: {e}")
+
+    def _is_own_group(self, group_name: str) -> bool:
+        """Check whether a group name is one of our (sharded) groups."""
+        bases = [self.group_name, self.group_name_v6] if self.ipv6 else [self.group_name]
+        return any(re.fullmatch(rf"{re.escape(base)}(-\d+)?", group_name) for base in bases)
+
+    def _site_groups(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        List the site's firewall groups at most once per sync.
+        
+        The listing refreshes the cached IDs of our groups.
+        
+        Returns:
+            Firewall groups, or None if the request failed
+        """
+        with self._groups_lock:
+            if self._groups is None:
+                self._groups = self._list_firewall_groups()
+                if self._groups is not None:
+                    for group in self._groups:
+                        group_id = group.get('id') or group.get('_id')
+                        group_name = group.get('name', '')
+                        if group_id and self._is_own_group(group_name):
+                            # A recreated group does not hold what was pushed
+                            if self._group_ids.get(group_name) != group_id:
+                                self._pushed.pop(group_name, None)
+                            self._group_ids[group_name] = group_id
+            return self._groups
+
+    def _resolve_group(self, group_name: str, group_type: str) -> Dict[str, Any]:
+        """
+        Get a firewall group by its cached ID, or list and create it.
+        
+        Args:
+            group_name: Name of the group
+            group_type: Group type (see GROUP_TYPES)
+            
+        Returns:
+            Firewall group data, empty if it cannot be resolved
+        """
+        group_id = self._group_ids.get(group_name)
+        if group_id:
+            return {'id': group_id, 'name': group_name, 'type': group_type}
+        
+        groups = self._site_groups()
+        if groups is None:
+            return {}
+        
+        group = self._get_firewall_group(groups, group_name, group_type)
+        group_id = group.get('id') or group.get('_id')
+        if group_id:
+            with self._groups_lock:
+                self._group_ids[group_name] = group_id
+                if group not in groups:
+                    groups.append(group)
+        return group
+
+    def _forget_group(self, group_name: str):
+        """
+        Invalidate the cached ID of a group that no longer exists.
+        
+        The next resolve lists the site's groups again.
+        
+        Args:
+            group_name: Name of the group
+        """
+        with self._groups_lock:
+            self._group_ids.pop(group_name, None)
+            self._pushed.pop(group_name, None)
+            self._groups = None
+
+    def _get_firewall_group(self, groups: List[Dict[str, Any]], group_name: str,
+                            group_type: str) -> Dict[str, Any]:
+        """
+        Get existing firewall group or create new one.
+        
+        Args:
+            groups: Firewall groups of the site
+            group_name: Name of the group
+            group_type: Group type (see GROUP_TYPES)
+            
+        Returns:
+            Firewall group data
+        """
+        try:
             # Find our group
             for group in groups:
-                if group.get('name') == self.group_name:
-                    self.log_debug(f"Found existing firewall group: {self.group_name}")
+                if group.get('name') == group_name:
+                    self.log_debug(f"Found existing firewall group: {group_name}")
                     return group
             
             # Create new group if not found
-            self.log_info(f"Creating new firewall group: {self.group_name}")
+            self.log_info(f"Creating new firewall group: {group_name}")
             
             create_url = f"{self.api_url}/v1/sites/{self.site_id}/firewall/groups"
             payload = {
-                'name': self.group_name,
-                'type': 'ipv4-address-group',
+                'name': group_name,
+                'type': group_type,
                 'members': []
             }
             
@@ -86,12 +425,215 @@ class UniFiSyncer(BaseSyncer):
                 self.log_debug(f"Response: {e.response.text}")
             return {}
 
-    def _update_firewall_group(self, group_id: str, ips: List[str]) -> bool:
+    def _read_members(self, group_id: str) -> Optional[List[str]]:
+        """
+        Read the current members of a firewall group from the gateway.
+        
+        Args:
+            group_id: Firewall group ID
+            
+        Returns:
+            Group members, or None if the request failed
+        """
+        try:
+            group_url = f"{self.api_url}/v1/sites/{self.site_id}/firewall/groups/{group_id}"
+            response = self.session.get(group_url, timeout=30)
+            response.raise_for_status()
+            
+            return response.json().get('data', {}).get('members', [])
+            
+        except (requests.RequestException, ValueError, AttributeError) as e:
+            self.log_error(f"Failed to read firewall group members: {e}")
+            return None
+
+    @staticmethod
+    def _digest(members: List[str]) -> str:
+        """
+        Hash a sorted member list.
+        
+        Args:
+            members: Sorted, unique members
+            
+        Returns:
+            SHA-256 hex digest
+        """
+        digest = hashlib.sha256()
+        for member in members:
+            digest.update(member.encode('ascii'))
+            digest.update(b'\n')
+        return digest.hexdigest()
+
+    def _sync_group(self, group: Dict[str, Any], plan: GroupPlan) -> bool:
+        """
+        Update one firewall group if its members differ.
+        
+        The desired members are compared with the group's current members
+        (read_back) or with the last pushed set, falling back to the members
+        in the group listing; the PUT is skipped when nothing differs. After
+        a restart only the hash of the last pushed set is known, which still
+        skips unchanged groups.
+        
+        Args:
+            group: Firewall group data
+            plan: Desired state of the group
+            
+        Returns:
+            True if the group is up to date
+        """
+        group_name, group_type, desired, digest, desired_set = plan
+        group_id = group.get('id') or group.get('_id')
+        if not group_id:
+            self.log_error(f"Invalid firewall group ID for {group_name}")
+            return False
+        
+        pushed = self._pushed.get(group_name)
+        
+        previous = None
+        if self.read_back:
+            current = self._read_members(group_id)
+            if current is not None:
+                previous = frozenset(current)
+        elif pushed is not None:
+            if pushed[0] == digest:
+                self._record(unchanged=1)
+                self.log_info(f"Firewall group {group_name} unchanged ({len(desired)} entries), skipping")
+                return True
+            previous = pushed[1]
+        if previous is None and isinstance(group.get('members'), list):
+            # Nothing pushed yet (or only its hash is known): the listing
+            # carries members
+            previous = frozenset(group['members'])
+        
+        added = removed = 0
+        if previous is not None:
+            added = len(desired_set - previous)
+            removed = len(previous - desired_set)
+            if not added and not removed:
+                self._pushed[group_name] = (digest, desired_set)
+                self._record(unchanged=1)
+                self.log_info(f"Firewall group {group_name} unchanged ({len(desired)} entries), skipping")
+                return True
+            self.log_info(f"Firewall group {group_name}: +{added} / -{removed} entries")
+        
+        if not self._update_firewall_group(group_id, group_name, group_type, desired):
+            return False
+        
+        self._pushed[group_name] = (digest, desired_set)
+        self._record(updated=1, added=added, removed=removed)
+        return True
+
+    def _record(self, **counts: int):
+        """
+        Add to the change counters of the current sync.
+        
+        Args:
+            **counts: Increments per counter name (see last_changes)
+        """
+        with self._changes_lock:
+            for key, value in counts.items():
+                self.last_changes[key] += value
+
+    def _shard(self, base_name: str, members: List[str]) -> Dict[str, List[str]]:
+        """
+        Split members over shard groups by a stable hash.
+        
+        CRC32 does not depend on the process (unlike hash()), so an entry
+        stays in its group while the number of shards is unchanged. The
+        hash does not balance the groups exactly, so each group is cut to
+        shard_size members separately; members arrive best ranked first,
+        so the cut drops the lowest ranked entries of that group.
+        
+        Args:
+            base_name: Group name without shard suffix
+            members: Entries of one address family, best ranked first
+            
+        Returns:
+            Members per group name, a single unsuffixed group when shards
+            is 1
+        """
+        count = self.shards
+        if count == 1:
+            shards = {base_name: members}
+        else:
+            shards = {f"{base_name}-{index}": [] for index in range(count)}
+            names = list(shards)
+            for member in members:
+                shards[names[zlib.crc32(member.encode('ascii')) % count]].append(member)
+        
+        # More groups would not be referenced by any firewall rule
+        if self.shard_size:
+            dropped = 0
+            for name, shard in shards.items():
+                if len(shard) > self.shard_size:
+                    dropped += len(shard) - self.shard_size
+                    shards[name] = shard[:self.shard_size]
+            if dropped:
+                self.log_warning(f"{dropped} of {len(members)} entries do not fit {count} group(s) "
+                                 f"of at most {self.shard_size} members, leaving out the lowest "
+                                 f"ranked; raise shards (and reference the new groups in the "
+                                 f"firewall rules) or lower max_entries")
+        return shards
+
+    def _delete_firewall_group(self, group: Dict[str, Any]) -> bool:
+        """
+        Delete a firewall group that is no longer needed.
+        
+        Args:
+            group: Firewall group data
+            
+        Returns:
+            True if the group was deleted
+        """
+        group_id = group.get('id') or group.get('_id')
+        group_name = group.get('name')
+        
+        try:
+            delete_url = f"{self.api_url}/v1/sites/{self.site_id}/firewall/groups/{group_id}"
+            response = self.session.delete(delete_url, timeout=30)
+            if response.status_code not in self.STALE_STATUSES:
+                response.raise_for_status()
+            
+            self._forget_group(group_name)
+            self._record(deleted=1)
+            self.log_info(f"Deleted surplus firewall group {group_name}")
+            return True
+            
+        except requests.RequestException as e:
+            # Groups still referenced by a firewall rule cannot be deleted
+            self._undeletable.add(group_name)
+            self.log_error(f"Failed to delete surplus firewall group {group_name}: {e}; "
+                           f"remove it from the firewall rules, it is not retried until restart")
+            return False
+
+    def _surplus_groups(self, wanted: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        """
+        Find our groups that the current sharding does not use.
+        
+        Every group of ours seen in a listing or created is in the ID
+        cache, so no listing is needed.
+        
+        Args:
+            wanted: Members per group name of the current sharding
+            
+        Returns:
+            Unused plain or shard groups
+        """
+        return [
+            {'id': group_id, 'name': group_name}
+            for group_name, group_id in sorted(self._group_ids.items())
+            if group_name not in wanted and group_name not in self._undeletable
+            and self._is_own_group(group_name)
+        ]
+
+    def _update_firewall_group(self, group_id: str, group_name: str, group_type: str,
+                               ips: List[str]) -> bool:
         """
         Update firewall group with new IP list.
         
         Args:
             group_id: Firewall group ID
+            group_name: Name of the group
+            group_type: Group type (see GROUP_TYPES)
             ips: List of IP addresses
             
         Returns:
@@ -102,14 +644,18 @@ class UniFiSyncer(BaseSyncer):
             
             payload = {
                 'members': ips,
-                'name': self.group_name,
-                'type': 'ipv4-address-group'
+                'name': group_name,
+                'type': group_type
             }
             
             response = self.session.put(update_url, json=payload, timeout=60)
+            if response.status_code in self.STALE_STATUSES:
+                self.log_info(f"Firewall group {group_name} ({group_id}) no longer exists")
+                self._forget_group(group_name)
+                return False
             response.raise_for_status()
             
-            self.log_info(f"Successfully updated firewall group with {len(ips)} IPs")
+            self.log_info(f"Successfully updated firewall group {group_name} with {len(ips)} entries")
             return True
             
         except requests.RequestException as e:
@@ -118,19 +664,35 @@ class UniFiSyncer(BaseSyncer):
                 self.log_debug(f"Response: {e.response.text}")
             return False
 
-    def sync(self, ips: List[str]) -> bool:
+    def _plan(self, ips: Sequence[str]) -> List[GroupPlan]:
         """
-        Sync malicious IPs to UniFi firewall.
+        Compute the desired state of every group.
         
         Args:
-            ips: List of IP addresses to block
+            ips: IP addresses and networks to block
             
         Returns:
-            True if sync was successful
+            Plans of all (sharded) groups
         """
-        self.log_info(f"Starting sync of {len(ips)} IPs to UniFi Gateway...")
+        # IPv6 entries contain a colon, IPv4 entries never do
+        ipv4 = [ip for ip in ips if ':' not in ip]
+        ipv6 = [ip for ip in ips if ':' in ip]
         
-        # Validate configuration
+        families = [(self.group_name, self.GROUP_TYPES[4], ipv4)]
+        if self.ipv6:
+            families.append((self.group_name_v6, self.GROUP_TYPES[6], ipv6))
+        elif ipv6:
+            self.log_info(f"IPv6 syncing disabled, skipping {len(ipv6)} IPv6 entries")
+        
+        plans = []
+        for base_name, group_type, members in families:
+            for group_name, shard in self._shard(base_name, members).items():
+                desired = sorted(set(shard))
+                plans.append((group_name, group_type, desired, self._digest(desired), frozenset(desired)))
+        return plans
+
+    def _validate(self) -> bool:
+        """Check that the site is fully configured."""
         if not self.api_token:
             self.log_error("API token not configured")
             return False
@@ -143,16 +705,100 @@ class UniFiSyncer(BaseSyncer):
             self.log_error("API URL not configured")
             return False
         
-        # Get or create firewall group
-        group = self._get_firewall_group()
-        if not group:
-            self.log_error("Failed to get firewall group")
+        return True
+
+    def _push(self, plans: List[GroupPlan]) -> bool:
+        """
+        Bring the groups of this site to the planned state.
+        
+        Args:
+            plans: Plans of all groups
+            
+        Returns:
+            True if every group is up to date
+        """
+        self.last_changes = {'added': 0, 'removed': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        
+        if not self._validate():
             return False
         
-        group_id = group.get('id') or group.get('_id')
-        if not group_id:
-            self.log_error("Invalid firewall group ID")
+        # Groups are listed only when an ID is not cached yet
+        self._groups = None
+        known_state = self._group_state()
+        
+        def sync_target(plan: GroupPlan) -> bool:
+            group_name, group_type = plan[0], plan[1]
+            
+            # Retry once when the cached ID turns out to be stale
+            for _ in range(2):
+                group = self._resolve_group(group_name, group_type)
+                if not group:
+                    self.log_error(f"Failed to get firewall group {group_name}")
+                    return False
+                
+                # Update the group only if its members changed
+                if self._sync_group(group, plan):
+                    return True
+                if group_name in self._group_ids:
+                    return False
             return False
         
-        # Update the group with new IPs
-        return self._update_firewall_group(group_id, ips)
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(plans)),
+                                thread_name_prefix=f'{self.name}-sync') as executor:
+            success = all(list(executor.map(sync_target, plans)))
+        
+        # Remove shards left over from a larger shard count, only once the
+        # current groups hold every entry
+        if success:
+            for group in self._surplus_groups({plan[0] for plan in plans}):
+                self._delete_firewall_group(group)
+        
+        if self._group_state() != known_state:
+            self._save_group_ids()
+        
+        self._log_changes(self.last_changes)
+        return success
+
+    def _log_changes(self, changes: Dict[str, int]):
+        """Log the change counters of a sync."""
+        self.log_info(f"Sync finished: {changes['updated']} group(s) updated, "
+                      f"{changes['unchanged']} unchanged, {changes['deleted']} deleted, "
+                      f"+{changes['added']} / -{changes['removed']} entries")
+
+    def sync(self, ips: Sequence[str]) -> bool:
+        """
+        Sync malicious IPs to UniFi firewall.
+        
+        Args:
+            ips: IP addresses and networks to block
+            
+        Returns:
+            True if sync was successful
+        """
+        if len(self.sites) == 1 and self.sites[0] is self:
+            self.log_info(f"Starting sync of {len(ips)} IPs to UniFi Gateway...")
+            return self._push(self._plan(ips))
+        
+        self.log_info(f"Starting sync of {len(ips)} IPs to {len(self.sites)} UniFi sites...")
+        
+        # The plan is the same for every site
+        plans = self._plan(ips)
+        
+        def push(site: 'UniFiSyncer') -> bool:
+            try:
+                return site._push(plans)
+            except Exception as e:
+                site.log_error(f"Unexpected error: {e}")
+                return False
+        
+        with ThreadPoolExecutor(max_workers=min(self.site_workers, len(self.sites)),
+                                thread_name_prefix=f'{self.name}-site') as executor:
+            results = list(executor.map(push, self.sites))
+        
+        self.last_changes = {key: sum(site.last_changes[key] for site in self.sites)
+                             for key in self.last_changes}
+        failed = [site.label for site, success in zip(self.sites, results) if not success]
+        if failed:
+            self.log_error(f"Sync failed for {len(failed)} of {len(self.sites)} sites: {', '.join(failed)}")
+        self._log_changes(self.last_changes)
+        return not failed
@@ -0,0 +1,29 @@
+"""
+Utilities module - helpers shared by core, collectors and syncers.
+"""
+from .iputils import pack_ip, unpack_ip, network_bounds
+from .iterutils import batched
+from .batch import IPBatch, IPRecords, as_batches, to_epoch
+from .bogons import RangeSet, BOGONS, is_public_ip, filter_bogons
+from .cidr import aggregate, rank_entries, to_entries
+from .ratelimit import TokenBucket
+
+
+__all__ = [
+    'pack_ip',
+    'unpack_ip',
+    'network_bounds',
+    'batched',
+    'IPBatch',
+    'IPRecords',
+    'as_batches',
+    'to_epoch',
+    'RangeSet',
+    'BOGONS',
+    'is_public_ip',
+    'filter_bogons',
+    'aggregate',
+    'rank_entries',
+    'to_entries',
+    'TokenBucket',
+]
@@ -0,0 +1,195 @@
+"""
+Compact columnar record batches passed from collectors to the database.
+"""
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .iputils import pack_ip, unpack_ip, PackedIP
+
+
+def to_epoch(value: Optional[Union[datetime, int, float]] = None) -> int:
+    """
+    Convert a timestamp to Unix epoch seconds.
+
+    Args:
+        value: datetime (naive values are local time), epoch seconds,
+            or None for the current time
+
+    Returns:
+        Epoch seconds
+    """
+    if value is None:
+        return int(time.time())
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+class IPBatch:
+    """
+    IPs reported by one source at one point in time.
+
+    Addresses are stored packed (see utils.iputils): IPv4 in an array('I'),
+    IPv6 as 16-byte slices of one bytearray, each with a parallel array('H')
+    of scores. The source tag and timestamp are stored once per batch, so
+    an entry costs 6 bytes (IPv4) or 18 bytes (IPv6) instead of a dict
+    and a datetime object.
+
+    Networks too large to expand into addresses are kept separately as
+    (first, last, score) tuples of packed addresses; they count as one
+    entry each but are not part of iteration.
+    """
+
+    def __init__(self, source: str, last_seen: Optional[Union[datetime, int, float]] = None):
+        """
+        Initialize an empty batch.
+
+        Args:
+            source: Source tag shared by every entry
+            last_seen: Timestamp shared by every entry (default: now)
+        """
+        self.source = source
+        self.last_seen = to_epoch(last_seen)
+        self.invalid = 0
+
+        self._v4 = array('I')
+        self._v4_scores = array('H')
+        self._v6 = bytearray()
+        self._v6_scores = array('H')
+        self.networks: List[Tuple[PackedIP, PackedIP, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._v4) + len(self._v6_scores) + len(self.networks)
+
+    def add(self, ip: str, score: int) -> bool:
+        """
+        Append an IP address string.
+
+        Args:
+            ip: IPv4 or IPv6 address
+            score: Score reported by the source
+
+        Returns:
+            False if the address was invalid and skipped
+        """
+        packed = pack_ip(ip.strip())
+        if packed is None:
+            self.invalid += 1
+            return False
+
+        self.add_packed(packed, score)
+        return True
+
+    def add_packed(self, packed: PackedIP, score: int):
+        """
+        Append an already packed address.
+
+        Args:
+            packed: int (IPv4) or 16 bytes (IPv6)
+            score: Score reported by the source
+        """
+        score = min(max(int(score), 0), 0xFFFF)
+
+        if isinstance(packed, int):
+            self._v4.append(packed)
+            self._v4_scores.append(score)
+        else:
+            self._v6 += packed
+            self._v6_scores.append(score)
+
+    def add_network(self, first: PackedIP, last: PackedIP, score: int):
+        """
+        Append a network as an address range.
+
+        Args:
+            first: First packed address of the network
+            last: Last packed address of the network (same family)
+            score: Score reported by the source
+        """
+        self.networks.append((first, last, min(max(int(score), 0), 0xFFFF)))
+
+    def extend(self, other: 'IPBatch'):
+        """
+        Append every entry of another batch.
+
+        Args:
+            other: Batch to copy entries from
+        """
+        self._v4.extend(other._v4)
+        self._v4_scores.extend(other._v4_scores)
+        self._v6 += other._v6
+        self._v6_scores.extend(other._v6_scores)
+        self.networks.extend(other.networks)
+        self.invalid += other.invalid
+
+    def __iter__(self) -> Iterator[Tuple[PackedIP, int]]:
+        """Iterate (packed ip, score) tuples, IPv4 first, without networks."""
+        yield from zip(self._v4, self._v4_scores)
+
+        v6 = bytes(self._v6)
+        for index, score in enumerate(self._v6_scores):
+            yield v6[index * 16:(index + 1) * 16], score
+
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate entries in the legacy collector dictionary format.
+
+        Yields:
+            Dictionaries with 'ip', 'source', 'score' and 'last_seen'
+        """
+        last_seen = datetime.fromtimestamp(self.last_seen)
+        for packed, score in self:
+            yield {
+                'ip': unpack_ip(packed),
+                'source': self.source,
+                'score': score,
+                'last_seen': last_seen
+            }
+
+    @classmethod
+    def from_dicts(cls, ips: Iterable[Dict[str, Any]]) -> List['IPBatch']:
+        """
+        Convert legacy collector dictionaries into batches.
+
+        Entries are grouped by source and last_seen (to the second).
+
+        Args:
+            ips: Dictionaries with 'ip', 'source', 'score' and 'last_seen'
+
+        Returns:
+            List of batches
+        """
+        batches: Dict[Tuple[str, int], IPBatch] = {}
+
+        for ip_data in ips:
+            key = (ip_data['source'], to_epoch(ip_data.get('last_seen')))
+            batch = batches.get(key)
+            if batch is None:
+                batch = batches[key] = cls(*key)
+            batch.add(ip_data['ip'], ip_data['score'])
+
+        return list(batches.values())
+
+
+IPRecords = Union[IPBatch, Iterable[IPBatch], List[Dict[str, Any]]]
+
+
+def as_batches(records: IPRecords) -> List[IPBatch]:
+    """
+    Normalize collector output to a list of batches.
+
+    Args:
+        records: An IPBatch, an iterable of IPBatch, or legacy dictionaries
+
+    Returns:
+        List of batches
+    """
+    if isinstance(records, IPBatch):
+        return [records]
+
+    records = list(records)
+    if records and not isinstance(records[0], IPBatch):
+        return IPBatch.from_dicts(records)
+    return records
@@ -0,0 +1,253 @@
+"""
+Reserved and bogon address filtering shared by all collectors.
+
+Networks are compiled once into sorted, merged interval tables per address
+family, so checking a packed address is a single binary search.
+"""
+import ipaddress
+from array import array
+from bisect import bisect_right
+from typing import Iterable, List, Sequence, Tuple, Union
+
+from .batch import IPBatch
+from .iputils import pack_ip, PackedIP, PackedRange
+
+
+# IPv4 special-purpose and reserved ranges (RFC 6890 and successors)
+BOGON_NETWORKS_V4 = [
+    '0.0.0.0/8',          # "This" network
+    '10.0.0.0/8',         # Private
+    '100.64.0.0/10',      # Shared address space (CGNAT)
+    '127.0.0.0/8',        # Loopback
+    '169.254.0.0/16',     # Link local
+    '172.16.0.0/12',      # Private
+    '192.0.0.0/24',       # IETF protocol assignments
+    '192.0.2.0/24',       # Documentation (TEST-NET-1)
+    '192.88.99.0/24',     # Deprecated 6to4 relay anycast
+    '192.168.0.0/16',     # Private
+    '198.18.0.0/15',      # Benchmarking
+    '198.51.100.0/24',    # Documentation (TEST-NET-2)
+    '203.0.113.0/24',     # Documentation (TEST-NET-3)
+    '224.0.0.0/4',        # Multicast
+    '240.0.0.0/4',        # Reserved, including broadcast
+]
+
+# IPv6 space outside global unicast, plus reserved ranges inside it
+BOGON_NETWORKS_V6 = [
+    '::/3',               # Unspecified, loopback, IPv4-mapped, discard, ...
+    '4000::/2',           # Unallocated
+    '8000::/1',           # Unallocated, ULA, link local, multicast
+    '2001:2::/48',        # Benchmarking
+    '2001:10::/28',       # ORCHID
+    '2001:db8::/32',      # Documentation
+    '3fff::/20',          # Documentation
+]
+
+
+class RangeSet:
+    """
+    Immutable set of address ranges with O(log n) membership tests.
+    """
+
+    def __init__(self, networks: Iterable[str]):
+        """
+        Compile networks into merged interval tables.
+
+        Args:
+            networks: CIDR strings of either address family
+        """
+        intervals = {4: [], 6: []}
+        for network in networks:
+            net = ipaddress.ip_network(network, strict=False)
+            intervals[net.version].append((int(net.network_address), int(net.broadcast_address)))
+
+        v4_starts, v4_ends = self._merge(intervals[4])
+        self._v4_starts = array('I', v4_starts)
+        self._v4_ends = array('I', v4_ends)
+        self._v6_starts, self._v6_ends = self._merge(intervals[6])
+
+    @staticmethod
+    def _merge(intervals: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+        """
+        Sort intervals and merge overlapping or adjacent ones.
+
+        Args:
+            intervals: (first, last) integer pairs
+
+        Returns:
+            Tuple of (starts, ends) lists
+        """
+        starts, ends = [], []
+        for first, last in sorted(intervals):
+            if ends and first <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], last)
+            else:
+                starts.append(first)
+                ends.append(last)
+        return starts, ends
+
+    def __contains__(self, packed: PackedIP) -> bool:
+        """
+        Check whether a packed address falls in any range.
+
+        Args:
+            packed: int (IPv4) or 16 bytes (IPv6), see utils.iputils
+
+        Returns:
+            True if the address is in the set
+        """
+        if isinstance(packed, int):
+            starts, ends, value = self._v4_starts, self._v4_ends, packed
+        else:
+            starts, ends, value = self._v6_starts, self._v6_ends, int.from_bytes(packed, 'big')
+
+        index = bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
+
+    def __len__(self) -> int:
+        """Number of merged ranges."""
+        return len(self._v4_starts) + len(self._v6_starts)
+
+    def overlaps(self, first: int, last: int, version: int) -> bool:
+        """
+        Check whether an integer address range intersects any range.
+
+        Args:
+            first: First address of the range
+            last: Last address of the range
+            version: Address family (4 or 6)
+
+        Returns:
+            True if any address of the range is in the set
+        """
+        starts, ends = (self._v4_starts, self._v4_ends) if version == 4 else (self._v6_starts, self._v6_ends)
+
+        # Last range starting at or before `last` is the only candidate
+        index = bisect_right(starts, last) - 1
+        return index >= 0 and ends[index] >= first
+
+    def subtract(self, first: PackedIP, last: PackedIP) -> List[PackedRange]:
+        """
+        Cut the ranges of the set out of an address range.
+
+        Args:
+            first: First packed address of the range
+            last: Last packed address of the range (same family)
+
+        Returns:
+            Remaining (first, last) packed ranges in ascending order, empty
+            if the set covers the whole range
+        """
+        if isinstance(first, int):
+            starts, ends, pack = self._v4_starts, self._v4_ends, int
+        else:
+            starts, ends = self._v6_starts, self._v6_ends
+            first, last = int.from_bytes(first, 'big'), int.from_bytes(last, 'big')
+
+            def pack(value: int) -> bytes:
+                return value.to_bytes(16, 'big')
+
+        remaining = []
+        index = max(bisect_right(starts, first) - 1, 0)
+        while first <= last and index < len(starts) and starts[index] <= last:
+            if ends[index] >= first:
+                if starts[index] > first:
+                    remaining.append((pack(first), pack(starts[index] - 1)))
+                first = ends[index] + 1
+            index += 1
+
+        if first <= last:
+            remaining.append((pack(first), pack(last)))
+        return remaining
+
+    def filter(self, ips: Sequence[Union[PackedIP, PackedRange]]
+               ) -> Tuple[List[Union[PackedIP, PackedRange]], int]:
+        """
+        Drop every address that is in the set, keeping the input order.
+
+        (first, last) ranges are cut to their parts outside the set (see
+        subtract), in place of the original range.
+
+        Args:
+            ips: Packed addresses and ranges
+
+        Returns:
+            Tuple of (kept addresses and ranges, number of addresses and
+            ranges dropped or cut)
+        """
+        # Plain lists with a sentinel range in front: no bounds check and
+        # no array element boxing in the hot loop
+        v4_starts, v4_ends = [-1, *self._v4_starts], [-1, *self._v4_ends]
+        v6_starts, v6_ends = [-1, *self._v6_starts], [-1, *self._v6_ends]
+        kept = []
+        dropped = 0
+
+        for ip in ips:
+            if isinstance(ip, int):
+                if ip > v4_ends[bisect_right(v4_starts, ip) - 1]:
+                    kept.append(ip)
+                else:
+                    dropped += 1
+            elif isinstance(ip, tuple):
+                parts = self.subtract(*ip)
+                if parts != [ip]:
+                    dropped += 1
+                kept.extend(parts)
+            else:
+                value = int.from_bytes(ip, 'big')
+                if value > v6_ends[bisect_right(v6_starts, value) - 1]:
+                    kept.append(ip)
+                else:
+                    dropped += 1
+
+        return kept, dropped
+
+
+BOGONS = RangeSet(BOGON_NETWORKS_V4 + BOGON_NETWORKS_V6)
+
+
+def is_public_ip(ip: str) -> bool:
+    """
+    Check whether a string is a valid, publicly routable IP address.
+
+    Args:
+        ip: IP address string
+
+    Returns:
+        False for malformed, private, reserved or bogon addresses
+    """
+    packed = pack_ip(ip)
+    return packed is not None and packed not in BOGONS
+
+
+def filter_bogons(batch: IPBatch) -> Tuple[IPBatch, int]:
+    """
+    Drop reserved and bogon addresses from a batch.
+
+    Networks are cut to their public parts and dropped if none is left.
+
+    Args:
+        batch: Batch to validate
+
+    Returns:
+        Tuple of (new batch with only public addresses, number of
+        addresses and networks rejected)
+    """
+    result = IPBatch(batch.source, batch.last_seen)
+    result.invalid = batch.invalid
+    rejected = 0
+
+    for packed, score in batch:
+        if packed in BOGONS:
+            rejected += 1
+        else:
+            result.add_packed(packed, score)
+
+    for first, last, score in batch.networks:
+        parts = BOGONS.subtract(first, last)
+        if not parts:
+            rejected += 1
+        for part_first, part_last in parts:
+            result.add_network(part_first, part_last, score)
+
+    return result, rejected
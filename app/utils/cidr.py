@@ -0,0 +1,256 @@
+"""
+CIDR aggregation of blocklist addresses before they are synced.
+"""
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .bogons import RangeSet
+from .iputils import pack_ip, unpack_ip, network_bounds, PackedIP, PackedRange
+
+
+def _ranges(values: List[int], bits: int, collapse_prefix: int,
+            collapse_min: float, exclude: Optional[RangeSet] = None) -> Iterator[Tuple[int, int]]:
+    """
+    Merge sorted, unique addresses into maximal runs of consecutive values.
+
+    Every collapse_prefix network holding at least collapse_min malicious
+    addresses is emitted as a whole, unless it overlaps the exclude set.
+
+    Args:
+        values: Sorted, unique addresses as integers
+        bits: Address width (32 or 128)
+        collapse_prefix: Prefix length of the networks considered for
+            collapsing
+        collapse_min: Number of addresses in a network that triggers
+            collapsing, 0 disables it
+        exclude: Ranges that must never be covered by a collapsed network
+
+    Yields:
+        (first, last) integer ranges in ascending order
+    """
+    shift = bits - collapse_prefix
+    needed = max(collapse_min, 0)
+
+    start = end = checked = None
+    index, count = 0, len(values)
+
+    while index < count:
+        first = last = values[index]
+        index += 1
+
+        # Each collapse network is counted once, at its first address
+        if needed and first >> shift != checked:
+            checked = first >> shift
+            network_last = ((checked + 1) << shift) - 1
+            group_end = index
+            if index < count and values[index] <= network_last:
+                group_end = bisect_right(values, network_last, index)
+
+            network_first = checked << shift
+            if group_end - index + 1 >= needed and not (
+                    exclude and exclude.overlaps(network_first, network_last, 4 if bits == 32 else 6)):
+                first = network_first
+                last = network_last
+                index = group_end
+
+        if start is not None and first <= end + 1:
+            end = max(end, last)
+        else:
+            if start is not None:
+                yield start, end
+            start, end = first, last
+
+    if start is not None:
+        yield start, end
+
+
+def _range_to_prefixes(first: int, last: int, bits: int) -> Iterator[Tuple[int, int]]:
+    """
+    Split an address range into the minimal list of aligned networks.
+
+    Args:
+        first: First address of the range
+        last: Last address of the range
+        bits: Address width (32 or 128)
+
+    Yields:
+        (network address, prefix length) tuples
+    """
+    while first <= last:
+        # Largest block aligned at first that does not overrun last
+        size = (first & -first).bit_length() - 1 if first else bits
+        size = min(size, (last - first + 1).bit_length() - 1)
+        yield first, bits - size
+        first += 1 << size
+
+
+def _merge_ranges(ranges: Iterable[Tuple[int, int]]) -> Iterator[Tuple[int, int]]:
+    """
+    Sort integer ranges and merge overlapping or adjacent ones.
+
+    Args:
+        ranges: (first, last) integer pairs
+
+    Yields:
+        Merged (first, last) ranges in ascending order
+    """
+    start = end = None
+    for first, last in sorted(ranges):
+        if start is not None and first <= end + 1:
+            end = max(end, last)
+        else:
+            if start is not None:
+                yield start, end
+            start, end = first, last
+
+    if start is not None:
+        yield start, end
+
+
+def _format_range(first: int, last: int, bits: int) -> Iterator[str]:
+    """
+    Format an integer address range as addresses and CIDR strings.
+
+    Args:
+        first: First address of the range
+        last: Last address of the range
+        bits: Address width (32 or 128)
+
+    Yields:
+        A plain address for single addresses, else the fewest networks
+    """
+    for network, prefix in _range_to_prefixes(first, last, bits):
+        address = unpack_ip(network if bits == 32 else network.to_bytes(16, 'big'))
+        yield address if prefix == bits else f"{address}/{prefix}"
+
+
+def to_entries(ips: Iterable[Union[PackedIP, PackedRange]]) -> List[str]:
+    """
+    Format packed addresses and ranges without aggregating them.
+
+    Args:
+        ips: Packed addresses and (first, last) ranges
+
+    Returns:
+        Addresses and CIDR strings in input order
+    """
+    entries = []
+    for ip in ips:
+        if not isinstance(ip, tuple):
+            entries.append(unpack_ip(ip))
+        elif isinstance(ip[0], int):
+            entries.extend(_format_range(ip[0], ip[1], 32))
+        else:
+            entries.extend(_format_range(int.from_bytes(ip[0], 'big'), int.from_bytes(ip[1], 'big'), 128))
+    return entries
+
+
+def aggregate(ips: Iterable[Union[PackedIP, PackedRange]], collapse_threshold: float = 0,
+              collapse_prefix_v4: int = 24, collapse_prefix_v6: int = 64,
+              collapse_count_v6: int = 0, exclude: Optional[RangeSet] = None) -> List[str]:
+    """
+    Merge addresses into the minimal list of CIDR networks.
+
+    Addresses are sorted once per family (O(n log n)) and walked in order,
+    which visits the same nodes a path-compressed prefix tree would:
+    adjacent and duplicate addresses merge into ranges, and each range is
+    split into the fewest aligned networks. Single addresses stay plain
+    addresses. Stored networks are passed as (first, last) ranges and
+    merged with the address runs.
+
+    Args:
+        ips: Packed addresses and ranges (see utils.iputils), in any order
+        collapse_threshold: Share (0-1] of a collapse prefix that must be
+            malicious for the whole network to be blocked, 0 disables it
+        collapse_prefix_v4: IPv4 prefix length considered for collapsing
+        collapse_prefix_v6: IPv6 prefix length considered for collapsing
+        collapse_count_v6: Block a whole IPv6 collapse prefix once it holds
+            this many malicious addresses, 0 uses collapse_threshold (a
+            share of a /64 is never reached in practice, while hosts
+            rotating addresses inside one /64 are common)
+        exclude: Ranges a collapsed network must not overlap (the allowlist)
+
+    Returns:
+        Addresses and CIDR strings, IPv4 first, in ascending order
+    """
+    v4, v6 = set(), set()
+    networks_v4, networks_v6 = [], []
+    for ip in ips:
+        if isinstance(ip, int):
+            v4.add(ip)
+        elif not isinstance(ip, tuple):
+            v6.add(int.from_bytes(ip, 'big'))
+        elif isinstance(ip[0], int):
+            networks_v4.append(ip)
+        else:
+            networks_v6.append((int.from_bytes(ip[0], 'big'), int.from_bytes(ip[1], 'big')))
+
+    def share(prefix: int, bits: int) -> float:
+        return collapse_threshold * (1 << (bits - prefix)) if collapse_threshold > 0 else 0
+
+    families = (
+        (v4, networks_v4, 32, collapse_prefix_v4, share(collapse_prefix_v4, 32)),
+        (v6, networks_v6, 128, collapse_prefix_v6, collapse_count_v6 or share(collapse_prefix_v6, 128)),
+    )
+
+    result = []
+    for values, networks, bits, collapse_prefix, collapse_min in families:
+        ranges = _ranges(sorted(values), bits, collapse_prefix, collapse_min, exclude)
+        if networks:
+            ranges = _merge_ranges([*ranges, *networks])
+        for first, last in ranges:
+            if first == last:
+                result.append(unpack_ip(first if bits == 32 else first.to_bytes(16, 'big')))
+            else:
+                result.extend(_format_range(first, last, bits))
+
+    return result
+
+
+def rank_entries(entries: List[str], ranked: Sequence[Union[PackedIP, PackedRange]]) -> List[str]:
+    """
+    Order aggregated entries by the best rank of the addresses they cover.
+
+    aggregate() returns entries in address order; syncers that have to cut
+    a list (e.g. per group) need them best ranked first instead.
+
+    Args:
+        entries: Disjoint addresses and CIDR strings, see aggregate()
+        ranked: Packed addresses and ranges the entries were built from,
+            best first
+
+    Returns:
+        The entries, best ranked first; entries covering none of the
+        ranked addresses come last in their original order
+    """
+    # Per family: sorted first addresses, last addresses and entry indexes
+    bounds = {4: ([], [], []), 6: ([], [], [])}
+    for index, entry in enumerate(entries):
+        if '/' in entry:
+            first, last = network_bounds(entry)
+        else:
+            first = last = pack_ip(entry)
+        starts, ends, indexes = bounds[4 if isinstance(first, int) else 6]
+        starts.append(first)
+        ends.append(last)
+        indexes.append(index)
+
+    for starts, ends, indexes in bounds.values():
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        starts[:] = [starts[i] for i in order]
+        ends[:] = [ends[i] for i in order]
+        indexes[:] = [indexes[i] for i in order]
+
+    best = [len(ranked)] * len(entries)
+    for rank, ip in enumerate(ranked):
+        first, last = ip if isinstance(ip, tuple) else (ip, ip)
+        starts, ends, indexes = bounds[4 if isinstance(first, int) else 6]
+
+        # Every entry overlapping [first, last]; one for an address
+        position = max(bisect_right(starts, first) - 1, 0)
+        while position < len(starts) and starts[position] <= last:
+            if ends[position] >= first and best[indexes[position]] > rank:
+                best[indexes[position]] = rank
+            position += 1
+
+    return [entries[index] for index in sorted(range(len(entries)), key=best.__getitem__)]
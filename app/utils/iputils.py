@@ -0,0 +1,75 @@
+"""
+Compact IP address encoding helpers.
+
+IPv4 addresses are encoded as unsigned 32-bit integers and IPv6 addresses
+as 16-byte big-endian strings. Both orderings match numeric address order,
+and SQLite sorts every INTEGER before every BLOB, so a single indexed
+column holding both supports range scans for either family.
+"""
+import ipaddress
+import socket
+from typing import Optional, Tuple, Union
+
+
+PackedIP = Union[int, bytes]
+
+# Network stored as its (first, last) packed addresses
+PackedRange = Tuple[PackedIP, PackedIP]
+
+
+def pack_ip(ip: str) -> Optional[PackedIP]:
+    """
+    Encode an IP address string.
+
+    Args:
+        ip: IPv4 or IPv6 address string
+
+    Returns:
+        int for IPv4, 16 bytes for IPv6, or None if the string is not an address
+    """
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+    except (OSError, TypeError):
+        pass
+
+    try:
+        return socket.inet_pton(socket.AF_INET6, ip)
+    except (OSError, TypeError):
+        return None
+
+
+def unpack_ip(value: PackedIP) -> str:
+    """
+    Decode a packed IP address back to its string form.
+
+    Args:
+        value: int (IPv4) or 16 bytes (IPv6)
+
+    Returns:
+        IP address string
+    """
+    if isinstance(value, int):
+        return socket.inet_ntop(socket.AF_INET, value.to_bytes(4, 'big'))
+    return socket.inet_ntop(socket.AF_INET6, bytes(value))
+
+
+def network_bounds(network: str) -> Tuple[PackedIP, PackedIP]:
+    """
+    Get the packed first and last address of a network.
+
+    Args:
+        network: CIDR string such as '203.0.113.0/24' or '2001:db8::/32'
+
+    Returns:
+        Tuple of (first, last) packed addresses
+
+    Raises:
+        ValueError: If the network string is invalid
+    """
+    net = ipaddress.ip_network(network, strict=False)
+    first = int(net.network_address)
+    last = int(net.broadcast_address)
+
+    if net.version == 4:
+        return first, last
+    return first.to_bytes(16, 'big'), last.to_bytes(16, 'big')
@@ -0,0 +1,27 @@
+"""
+Iteration helpers for streaming pipelines.
+"""
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+
+T = TypeVar('T')
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split an iterable into lists of at most `size` items.
+
+    Args:
+        iterable: Items to group
+        size: Maximum batch size
+
+    Yields:
+        Lists of consecutive items; only the last one may be shorter
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
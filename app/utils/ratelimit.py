@@ -0,0 +1,52 @@
+"""
+Token bucket rate limiting for outgoing API requests.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill at `rate` per second up to `burst`; every request takes
+    one token and waits when none is left, so short bursts pass at once
+    while the sustained rate stays at `rate`.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate: Tokens per second, 0 disables limiting
+            burst: Bucket capacity
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take one token, waiting until one is available.
+
+        Returns:
+            Seconds waited
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            # Reserve the token now; concurrent callers queue up behind it
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait:
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,96 @@
+"""
+Migration of databases written by the original schema (version 0).
+
+Run with: python -m pytest tests (or python -m unittest discover tests)
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+from app.core.database import IPDatabase
+from app.utils.iputils import pack_ip
+
+
+# Rows as the original add_ips() stored them: TEXT addresses, comma-joined
+# sources and local-time datetime strings
+V0_ROWS = [
+    ('203.0.113.7', 'ipsum,cncert', 7, datetime(2024, 1, 15, 12, 0, 0), datetime(2024, 1, 10, 8, 30, 0)),
+    ('2001:db8::1', 'abuseipdb', 3, datetime(2024, 2, 1, 6, 15, 30), datetime(2024, 2, 1, 6, 15, 30)),
+    ('not-an-ip', 'ipsum', 5, datetime(2024, 1, 1), datetime(2024, 1, 1)),
+]
+
+
+class TestImportV0(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'ips.db')
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE malicious_ips (
+                ip_address TEXT PRIMARY KEY,
+                sources TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                last_seen TIMESTAMP NOT NULL,
+                created_at TIMESTAMP NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX idx_last_seen ON malicious_ips(last_seen)")
+        conn.executemany("INSERT INTO malicious_ips VALUES (?, ?, ?, ?, ?)",
+                         [(ip, sources, score, str(last_seen), str(created_at))
+                          for ip, sources, score, last_seen, created_at in V0_ROWS])
+        conn.commit()
+        conn.close()
+
+        self.db = IPDatabase(self.db_path)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def query(self, sql, params=()):
+        return self.db.connections.reader().execute(sql, params).fetchall()
+
+    def test_schema_version(self):
+        self.assertEqual(self.query("PRAGMA user_version")[0][0], IPDatabase.SCHEMA_VERSION)
+        tables = {row[0] for row in self.query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertNotIn('malicious_ips_old', tables)
+
+    def test_rows(self):
+        rows = {row[0]: row[1:] for row in self.query(
+            "SELECT ip_address, score, source_count FROM malicious_ips")}
+        self.assertEqual(rows, {
+            pack_ip('203.0.113.7'): (7, 2),
+            pack_ip('2001:db8::1'): (3, 1),
+        })
+
+    def test_sources(self):
+        sightings = sorted(self.query("SELECT ip_address, source, score FROM ip_sightings"),
+                           key=lambda row: row[1])
+        self.assertEqual(sightings, [
+            (pack_ip('2001:db8::1'), 'abuseipdb', 3),
+            (pack_ip('203.0.113.7'), 'cncert', 7),
+            (pack_ip('203.0.113.7'), 'ipsum', 7),
+        ])
+
+    def test_epoch_timestamps(self):
+        for ip, _, _, last_seen, created_at in V0_ROWS[:2]:
+            row = self.query("SELECT last_seen, created_at FROM malicious_ips WHERE ip_address = ?",
+                             (pack_ip(ip),))[0]
+            self.assertEqual(row, (int(last_seen.timestamp()), int(created_at.timestamp())))
+
+        types = self.query("SELECT DISTINCT typeof(last_seen) FROM ip_sightings")
+        self.assertEqual(types, [('integer',)])
+
+    def test_source_counts(self):
+        self.assertEqual(self.db.get_stats(), {
+            'total_ips': 2,
+            'sources': {'abuseipdb': 1, 'cncert': 1, 'ipsum': 1},
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()